@@ -14,8 +14,25 @@ NTiL
     Grid satisfying the no-three-in-line condition.
 UNTiL
     Grid satisfying both the uniformity and no-three-in-line conditions.
+FrozenGrid, FrozenUniformGrid, FrozenNTiL, FrozenUNTiL
+    Immutable, hashable variants of the grid classes.
+GridView
+    Lazy view of a grid under a symmetry of the square.
+SparseGrid, SparseUniformGrid, SparseNTiL, SparseUNTiL
+    Variants of the grid classes storing per-row and per-column sets, for very large n.
+validate_many
+    Validate many occupancy lists against a grid class in a pool of worker processes.
 """
 
 from .grids import Grid, UniformGrid, NTiL, UNTiL, til
+from .frozen import FrozenGrid, FrozenUniformGrid, FrozenNTiL, FrozenUNTiL
+from .views import GridView
+from .sparse import SparseGrid, SparseUniformGrid, SparseNTiL, SparseUNTiL
+from .validation import validate_many
 
-__all__ = ["Grid", "UniformGrid", "NTiL", "UNTiL"]
\ No newline at end of file
+__all__ = [
+    "Grid", "UniformGrid", "NTiL", "UNTiL",
+    "FrozenGrid", "FrozenUniformGrid", "FrozenNTiL", "FrozenUNTiL",
+    "SparseGrid", "SparseUniformGrid", "SparseNTiL", "SparseUNTiL",
+    "GridView", "validate_many",
+]
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Command line interface of the until package.
+
+    python -m until validate [FILE] [--class UNTiL] [--n N] [--workers W] [--invalid-only]
+
+reads one grid per line from FILE, or from standard input if FILE is omitted or "-", and writes
+one JSON result per line to standard output,
+
+    {"line": 1, "valid": true, "error": null}
+    {"line": 2, "valid": false, "error": "Cannot have three occupancies in a straight line: ..."}
+
+Each input line is either a JSON list of [row, col] pairs, or a JSON object with an "occupancies"
+list and optionally the side length "n". Blank lines are skipped, and lines that cannot be parsed
+are reported as invalid rather than stopping the run. The side length of a line is its "n", or
+else the value of --n, or else half the number of occupancies, as for a uniform grid. Lines with n
+above until.validation.MAX_DENSE_N are reported as invalid unless --class names a sparse class.
+
+The input is read and checked in chunks, with a bounded number of chunks in flight, so memory use
+does not grow with the size of the input, and --workers spreads the chunks, parsing included,
+over that many processes. The exit status is 0 if every grid is valid, 1 if some grid is not,
+and 2 for a usage error.
+
+Functions
+-----------
+main(argv=None)
+    Run the command line interface.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from .validation import CLASSES, _check, _chunks, _run_chunks
+
+def _parse_line(line, n):
+    """
+    Return the (n, occupancies) item of an input line.
+
+    Raises
+    ---------
+    ValueError
+        If the line is not a JSON occupancy list or an object holding one.
+    """
+    data = json.loads(line)
+    if isinstance(data, dict):
+        n = data.get("n", n)
+        data = data.get("occupancies")
+    if not isinstance(data, list):
+        raise ValueError("expected a list of [row, col] pairs")
+
+    occupancies = [tuple(p) for p in data]
+    if n is None:
+        n = len(occupancies) // 2
+    return n, occupancies
+
+def _validate_lines(cls, n, start, lines):
+    """
+    Parse and validate a chunk of input lines against cls, for use as a worker process task.
+
+    Returns
+    ----------
+    list[tuple[int, bool, str or None]]
+        For each non-blank line, its 1-based line number, whether it is valid, and the error
+        message if it is not.
+    """
+    results = []
+    for number, line in enumerate(lines, start + 1):
+        if not line.strip():
+            continue
+        try:
+            item = _parse_line(line, n)
+        except (TypeError, ValueError) as e:
+            results.append((number, False, f"Malformed line: {e}"))
+        else:
+            results.append((number, *_check(cls, *item)))
+    return results
+
+def _validate(args, source):
+    """
+    Run the validate subcommand on the lines of source and return the exit status.
+    """
+    cls = CLASSES[args.cls]
+    out = sys.stdout
+    total = invalid = 0
+
+    try:
+        with source:
+            results = _run_chunks(
+                _validate_lines, (cls, args.n), _chunks(source, args.chunksize),
+                args.workers, not args.unordered,
+            )
+            for number, valid, error in results:
+                total += 1
+                if not valid:
+                    invalid += 1
+                elif args.invalid_only:
+                    continue
+                out.write(json.dumps({"line": number, "valid": valid, "error": error}) + "\n")
+            out.flush()
+    except BrokenPipeError:
+        # The reader of the output has gone, as with "| head". Point stdout at devnull so that
+        # Python does not raise again when it flushes stdout at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+    print(f"{total} grid(s) checked, {invalid} invalid.", file=sys.stderr)
+    return 1 if invalid else 0
+
+def main(argv=None):
+    """
+    Run the command line interface and return the exit status.
+    """
+    parser = argparse.ArgumentParser(prog="python -m until", description="Tools for until grids.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    validate = subparsers.add_parser(
+        "validate", help="validate one occupancy list per line",
+        description="Validate one occupancy list per line, writing one JSON result per line.",
+    )
+    validate.add_argument(
+        "file", nargs="?", default="-", help="input file (default: standard input)",
+    )
+    validate.add_argument(
+        "--class", dest="cls", choices=list(CLASSES), default="UNTiL",
+        help="class to validate against (default UNTiL)",
+    )
+    validate.add_argument("--n", type=int, help="side length of lines that do not give one")
+    validate.add_argument(
+        "--workers", type=int, default=1, help="worker processes, 0 for one per CPU (default 1)",
+    )
+    validate.add_argument(
+        "--chunksize", type=int, default=256, help="lines per worker task (default 256)",
+    )
+    validate.add_argument(
+        "--unordered", action="store_true",
+        help="write results as chunks finish rather than in input order",
+    )
+    validate.add_argument(
+        "--invalid-only", action="store_true", help="write only the results of invalid grids",
+    )
+
+    args = parser.parse_args(argv)
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+
+    if args.file == "-":
+        source = sys.stdin
+    else:
+        try:
+            source = open(args.file)
+        except OSError as e:
+            parser.error(f"cannot open {args.file}: {e.strerror}")
+    return _validate(args, source)
+
+if __name__ == "__main__":
+    sys.exit(main())
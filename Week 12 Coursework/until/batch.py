@@ -0,0 +1,498 @@
+"""
+Vectorised operations on batches of grids for the until package.
+
+This module requires NumPy. A GridBatch holds B grids of the same side length n as a single
+(B, n, n) Boolean array, so that the transforms, XOR-style addition, comparisons and the
+uniformity check are each a handful of NumPy operations over the whole batch rather than a Python
+loop per grid. Individual grids can be converted back to Grid objects, or any of its subclasses,
+on demand.
+
+Classes
+----------
+GridBatch
+    A batch of grids of the same size stored as a Boolean array.
+
+Functions
+-----------
+ntil_mask(batch, max_elements=2 ** 22)
+    Test which grids of a batch satisfy the no-three-in-line condition.
+"""
+
+import numpy as np
+
+from .grids import Grid
+from .exceptions import OperatorError
+
+class GridBatch:
+    """
+    Represent a batch of n x n occupancy grids as a (B, n, n) Boolean array.
+
+    Parameters
+    -------------
+    cells: array_like
+        Array of shape (B, n, n) whose entry [b, row, col] is True when cell (row, col) of grid b
+        is occupied.
+
+    To construct an instance from existing grids or occupancy lists, use the class methods, for
+    example
+
+    GridBatch.from_grids([g1, g2, ...])
+
+    GridBatch.from_occupancies(n=..., occupancy_lists=[[(r1, c1), ...], ...])
+
+    Attributes
+    -------------
+    n: int
+        Side length of the grids.
+
+    cells: numpy.ndarray
+        The underlying (B, n, n) Boolean array.
+
+    Methods
+    ----------
+    from_grids(grids)
+        Build a batch from a sequence of grids.
+
+    from_occupancies(n, occupancy_lists)
+        Build a batch from a sequence of occupancy lists.
+
+    from_packed(n, packed)
+        Build a batch from the bit-packed form returned by packed().
+
+    packed()
+        Return the grids bit-packed into a (B, ceil(n * n / 8)) array of bytes.
+
+    occupancies(i)
+        Return the occupied coordinates of grid i.
+
+    to_grids(cls=Grid)
+        Convert every grid of the batch to an instance of cls.
+
+    v_reflected(), h_reflected(), rotated()
+        Return the batch of transformed grids.
+
+    is_uniform()
+        Test which grids have exactly two occupancies in every row and column.
+
+    __add__(h)
+        Return the batch of XOR-style sums with h.
+
+    __eq__(h), __le__(h), __ge__(h)
+        Test, grid by grid, for equality, subsets and supersets of h.
+
+    Notes
+    --------
+    Wherever a batch is combined or compared with h, h may be another batch of the same length or
+    a single Grid, which is then used for every grid in the batch.
+    """
+
+    def __init__(self, cells):
+        """
+        This method initialises instances of GridBatch.
+
+        Parameters
+        -------------
+        cells: array_like
+            Array of shape (B, n, n) of occupancies.
+
+        Raises
+        ---------
+        ValueError
+            If cells does not have shape (B, n, n).
+        """
+        cells = np.asarray(cells, dtype=bool)
+        if cells.ndim != 3 or cells.shape[1] != cells.shape[2]:
+            raise ValueError('cells must have shape (B, n, n).')
+        self._cells = cells
+
+    @classmethod
+    def from_occupancies(cls, n, occupancy_lists):
+        """
+        This method builds a batch from occupancy lists.
+
+        Parameters
+        -------------
+        n: int
+            Side length of the grids.
+
+        occupancy_lists: iterable[list[tuple[int, int]]]
+            Coordinates of the occupied cells of each grid.
+
+        Returns
+        ----------
+        GridBatch
+            Batch with one grid per occupancy list, in order.
+
+        Raises
+        ---------
+        IndexError
+            If any coordinate lies outside the grid. Negative coordinates are rejected as Grid
+            rejects them, rather than counted from the end of the row or column.
+
+        Notes
+        --------
+        When every list has the same length, as for uniform grids, all the cells are set by a
+        single indexing operation.
+        """
+        occupancy_lists = list(occupancy_lists)
+        cells = np.zeros((len(occupancy_lists), n, n), dtype=bool)
+
+        if len({len(occupancies) for occupancies in occupancy_lists}) == 1:
+            coords = np.asarray(occupancy_lists, dtype=np.intp).reshape(len(occupancy_lists), -1, 2)
+            if ((coords < 0) | (coords >= n)).any():
+                raise IndexError('Grid coordinates out of range.')
+            batch_index = np.arange(len(occupancy_lists))[:, None]
+            cells[batch_index, coords[:, :, 0], coords[:, :, 1]] = True
+            return cls(cells)
+
+        for b, occupancies in enumerate(occupancy_lists):
+            if occupancies:
+                rows, cols = np.asarray(occupancies, dtype=np.intp).T
+                if min(rows.min(), cols.min()) < 0 or max(rows.max(), cols.max()) >= n:
+                    raise IndexError('Grid coordinates out of range.')
+                cells[b, rows, cols] = True
+        return cls(cells)
+
+    @classmethod
+    def from_grids(cls, grids):
+        """
+        This method builds a batch from grids of the same size.
+
+        Parameters
+        -------------
+        grids: iterable[Grid]
+            Grids to store.
+
+        Returns
+        ----------
+        GridBatch
+            Batch with one entry per grid, in order.
+
+        Raises
+        ---------
+        OperatorError
+            If the grids do not all have the same side length.
+
+        ValueError
+            If grids is empty, since the side length is then unknown.
+        """
+        grids = list(grids)
+        if not grids:
+            raise ValueError('Cannot infer the side length of an empty batch of grids.')
+
+        n = grids[0]._n
+        if any(grid._n != n for grid in grids):
+            raise OperatorError('Error: Grids must be of matching size.')
+        return cls.from_occupancies(n, (grid.occupancies for grid in grids))
+
+    @classmethod
+    def from_packed(cls, n, packed):
+        """
+        This method builds a batch from the bit-packed form returned by packed().
+
+        Parameters
+        -------------
+        n: int
+            Side length of the grids.
+
+        packed: array_like
+            Array of shape (B, ceil(n * n / 8)) of uint8.
+
+        Returns
+        ----------
+        GridBatch
+            Batch of the unpacked grids.
+        """
+        packed = np.asarray(packed, dtype=np.uint8)
+        cells = np.unpackbits(packed, axis=1, count=n * n)
+        return cls(cells.reshape(len(packed), n, n))
+
+    @property
+    def n(self):
+        """
+        This method returns the side length of the grids in the batch.
+        """
+        return self._cells.shape[1]
+
+    @property
+    def cells(self):
+        """
+        This method returns the underlying (B, n, n) Boolean array.
+        """
+        return self._cells
+
+    def __len__(self):
+        """
+        This method returns the number of grids in the batch.
+        """
+        return len(self._cells)
+
+    def __repr__(self):
+        """
+        This method returns a short description of the batch.
+        """
+        return f"GridBatch(size={len(self)}, n={self.n})"
+
+    def __getitem__(self, i):
+        """
+        This method returns grid i as a Grid, or a sub-batch if i is a slice or an index array.
+        """
+        if isinstance(i, (int, np.integer)):
+            return Grid(self.n, self.occupancies(i))
+        return GridBatch(self._cells[i])
+
+    def __iter__(self):
+        """
+        This method iterates over the grids of the batch as Grid objects.
+        """
+        for i in range(len(self)):
+            yield self[i]
+
+    def packed(self):
+        """
+        This method returns the grids bit-packed, eight cells to a byte, in row-major order.
+
+        Returns
+        ----------
+        numpy.ndarray
+            Array of shape (B, ceil(n * n / 8)) of uint8.
+        """
+        return np.packbits(self._cells.reshape(len(self), -1), axis=1)
+
+    def occupancies(self, i):
+        """
+        This method returns the occupied coordinates of grid i.
+
+        Returns
+        ----------
+        list[tuple[int, int]]
+            Occupied coordinates in row-major order.
+        """
+        rows, cols = np.nonzero(self._cells[i])
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def to_grids(self, cls=Grid):
+        """
+        This method converts every grid of the batch to an instance of cls.
+
+        Parameters
+        -------------
+        cls: type
+            Grid or one of its subclasses, by default Grid.
+
+        Returns
+        ----------
+        list[Grid]
+            One instance per grid, in order.
+
+        Raises
+        ---------
+        OccupancyError
+            If some grid does not satisfy the conditions of cls.
+        """
+        return [cls(self.n, self.occupancies(i)) for i in range(len(self))]
+
+    def v_reflected(self):
+        """
+        This method returns the vertical reflection of every grid.
+        """
+        return GridBatch(self._cells[:, ::-1, :])
+
+    def h_reflected(self):
+        """
+        This method returns the horizontal reflection of every grid.
+        """
+        return GridBatch(self._cells[:, :, ::-1])
+
+    def rotated(self):
+        """
+        This method returns the 90 degree clockwise rotation of every grid.
+        """
+        return GridBatch(np.rot90(self._cells, k=-1, axes=(1, 2)))
+
+    def is_uniform(self):
+        """
+        This method tests which grids have exactly two occupancies in every row and column.
+
+        Returns
+        ----------
+        numpy.ndarray
+            Boolean vector of length B.
+        """
+        rows_ok = (self._cells.sum(axis=2) == 2).all(axis=1)
+        cols_ok = (self._cells.sum(axis=1) == 2).all(axis=1)
+        return rows_ok & cols_ok
+
+    def _other_cells(self, h):
+        """
+        This method returns the cells of h for combining with this batch.
+
+        Raises
+        ---------
+        OperatorError
+            If h has a different side length, or is a batch of a different length.
+        """
+        if isinstance(h, Grid):
+            if h._n != self.n:
+                raise OperatorError('Error: Grids must be of matching size.')
+            return GridBatch.from_occupancies(h._n, [h.occupancies])._cells
+
+        if h.n != self.n:
+            raise OperatorError('Error: Grids must be of matching size.')
+        if len(h) != len(self):
+            raise OperatorError('Error: Batches must be of matching length.')
+        return h._cells
+
+    def __add__(self, h):
+        """
+        This method returns the XOR-style sum of every grid with the corresponding grid of h.
+
+        Raises
+        ---------
+        OperatorError
+            If the sizes do not match.
+        """
+        return GridBatch(self._cells ^ self._other_cells(h))
+
+    def __eq__(self, h):
+        """
+        This method tests, grid by grid, whether this batch equals h.
+
+        Returns
+        ----------
+        numpy.ndarray
+            Boolean vector of length B.
+
+        Raises
+        ---------
+        OperatorError
+            If the sizes do not match.
+        """
+        if not isinstance(h, (Grid, GridBatch)):
+            return NotImplemented
+        return (self._cells == self._other_cells(h)).all(axis=(1, 2))
+
+    __hash__ = None
+
+    def __le__(self, h):
+        """
+        This method tests, grid by grid, whether the occupancies of this batch are a subset of h.
+
+        Returns
+        ----------
+        numpy.ndarray
+            Boolean vector of length B.
+
+        Raises
+        ---------
+        OperatorError
+            If the sizes do not match.
+        """
+        return ~(self._cells & ~self._other_cells(h)).any(axis=(1, 2))
+
+    def __ge__(self, h):
+        """
+        This method tests, grid by grid, whether the occupancies of this batch are a superset of h.
+
+        Returns
+        ----------
+        numpy.ndarray
+            Boolean vector of length B.
+
+        Raises
+        ---------
+        OperatorError
+            If the sizes do not match.
+        """
+        return ~(self._other_cells(h) & ~self._cells).any(axis=(1, 2))
+
+def _triple_blocks(k, size):
+    """
+    Yield the index arrays (first, second, third) of the triples i < j < l of range(k), in blocks
+    of at most size triples.
+
+    The triples with first index i are produced together, as the upper triangle of the pairs of
+    later indices, and are split or merged with their neighbours to fill each block, so at most
+    O(size + k^2) indices exist at any time rather than all k(k - 1)(k - 2)/6 triples.
+    """
+    pending = []
+    count = 0
+    for i in range(k - 2):
+        second, third = np.triu_indices(k - i - 1, 1)
+        second += i + 1
+        third += i + 1
+        first = np.full(len(second), i, dtype=second.dtype)
+
+        for start in range(0, len(first), size):
+            stop = start + size
+            piece = (first[start:stop], second[start:stop], third[start:stop])
+            if pending and count + len(piece[0]) > size:
+                yield tuple(np.concatenate(arrays) for arrays in zip(*pending))
+                pending = []
+                count = 0
+            pending.append(piece)
+            count += len(piece[0])
+
+    if pending:
+        yield tuple(np.concatenate(arrays) for arrays in zip(*pending))
+
+def ntil_mask(batch, max_elements=2 ** 22):
+    """
+    Test which grids of a batch satisfy the no-three-in-line condition.
+
+    Three occupancies a, b and c lie in a line exactly when the cross product of b - a and c - a
+    is zero, which is the condition tested by til. The cross products for every triple of
+    occupancies of every grid are evaluated with NumPy integer arithmetic.
+
+    Parameters
+    -------------
+    batch: GridBatch
+        Grids to test.
+
+    max_elements: int
+        Approximate number of triples evaluated at once, by default 2 ** 22. The triples of each
+        grid are generated in blocks of at most this many, and the grids are processed in chunks
+        so that a chunk times a block stays within it, which bounds the memory used however many
+        occupancies a grid has.
+
+    Returns
+    ----------
+    numpy.ndarray
+        Boolean vector of length B, True for the grids with no three occupancies in a line.
+
+    Notes
+    --------
+    The grids are grouped by their number of occupancies k, so that each group shares one stream
+    of k(k - 1)(k - 2)/6 triples. Grids that have already failed are dropped from later blocks.
+    Grids with fewer than three occupancies always pass.
+    """
+    cells = batch.cells
+    counts = cells.sum(axis=(1, 2))
+    mask = np.ones(len(batch), dtype=bool)
+
+    for k in np.unique(counts):
+        k = int(k)
+        if k < 3:
+            continue
+
+        members = np.flatnonzero(counts == k)
+        _, rows, cols = np.nonzero(cells[members])
+        coords = np.stack([rows, cols], axis=-1).astype(np.int64).reshape(len(members), k, 2)
+        alive = np.ones(len(members), dtype=bool)
+
+        for first, second, third in _triple_blocks(k, max_elements):
+            chunk = max(1, max_elements // len(first))
+            remaining = np.flatnonzero(alive)
+            for start in range(0, len(remaining), chunk):
+                index = remaining[start:start + chunk]
+                pts = coords[index]
+                u = pts[:, second] - pts[:, first]
+                v = pts[:, third] - pts[:, first]
+                cross = u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+                alive[index] = (cross != 0).all(axis=1)
+            if not alive.any():
+                break
+
+        mask[members] = alive
+
+    return mask
@@ -0,0 +1,380 @@
+"""
+Headless benchmark suite for the until grid classes.
+
+Run it as
+
+    python -m until.bench --output results.json
+    python -m until.bench --baseline results.json --threshold 0.25
+
+Each operation is timed for each grid class over a range of side lengths n. The operations are
+construction, trusted construction, validation, transforms, comparisons, addition and commutator
+moves. Each class is timed on one family of grids at every n, so that its times are comparable
+across side lengths:
+
+    Grid, UniformGrid
+        A random uniform grid, with 2n occupancies.
+
+    NTiL
+        The p-point parabola {(x, x^2 mod p)} for the largest prime p <= n, which has no three
+        points in a line.
+
+    UNTiL
+        The valid samples of until.tests.samples, for n from 4 to 13, and any UNTiL grids saved
+        in the on-disk corpus of until.tests.corpus, or else a grid found by
+        until.search.find_until for n up to UNTIL_SEARCH_MAX, with 2n occupancies. Larger side
+        lengths are skipped, since no construction of large UNTiL grids is known that is fast
+        enough to run before every benchmark. Build the corpus to time them.
+
+For every operation the results record the best time per call and the number of occupancies k at
+each n, and the empirical scaling exponent, which is the slope of the least-squares line through
+log(time) against log(k). As k = 2n for every class but NTiL, this is also the exponent in n for
+those classes, while for NTiL it is not skewed by the gaps between primes. Given a
+baseline, an operation regresses when the geometric mean of its time ratios against the baseline,
+over the n they share, exceeds 1 + threshold, and the runner then exits with status 1. Plotting is
+optional and needs matplotlib.
+
+Functions
+-----------
+run(sizes, classes=None, operations=None, repeat=3, min_time=0.02, seed=0)
+    Time the operations and return the results.
+
+compare(results, baseline, threshold=0.25)
+    Return the operations of results that regress against baseline.
+
+plot(results, path)
+    Save a log-log plot of the results.
+
+main(argv=None)
+    Run the command line interface.
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+from timeit import Timer
+
+from .grids import Grid, UniformGrid, NTiL, UNTiL
+from .search import find_until
+from .tests import samples
+from .tests.samples import until_occupancies
+
+CLASSES = {"Grid": Grid, "UniformGrid": UniformGrid, "NTiL": NTiL, "UNTiL": UNTiL}
+
+OPERATIONS = (
+    "construct", "construct_trusted", "validate", "rotated", "h_reflected", "v_reflected",
+    "canonical", "eq", "le", "add", "commutator",
+)
+
+DEFAULT_SYNTHETIC = (14, 16, 18, 20, 24, 32, 48, 64)
+
+# find_until takes about a second per grid up to this side length, and grows quickly beyond it.
+UNTIL_SEARCH_MAX = 20
+UNTIL_TIME_LIMIT = 10.0
+
+def _largest_prime(n):
+    """
+    Return the largest prime not exceeding n, for n at least 2.
+    """
+    for p in range(n, 1, -1):
+        if all(p % d for d in range(2, math.isqrt(p) + 1)):
+            return p
+
+def _occupancies(cls, n, rng):
+    """
+    Return a valid occupancy list for cls of side length n, or None if there is none to time.
+    """
+    if cls is NTiL:
+        p = _largest_prime(n)
+        return [(x, x * x % p) for x in range(p)]
+    if cls is not UNTiL:
+        return UniformGrid.random(n, rng).occupancies
+
+    for occupancies in until_occupancies + samples.corpus_until_occupancies:
+        if len(occupancies) == 2 * n:
+            return occupancies
+    if n <= UNTIL_SEARCH_MAX:
+        grid = find_until(n, time_limit=UNTIL_TIME_LIMIT, seed=rng.randrange(1 << 32))
+        if grid is not None:
+            return grid.occupancies
+    return None
+
+def _statements(cls, n, occupancies):
+    """
+    Return a dict from operation name to a zero-argument callable performing it once.
+    """
+    grid = cls(n, occupancies)
+    other = cls(n, occupancies)
+    statements = {
+        "construct": lambda: cls(n, occupancies),
+        "construct_trusted": lambda: cls.from_trusted(n, occupancies),
+        "rotated": grid.rotated,
+        "h_reflected": grid.h_reflected,
+        "v_reflected": grid.v_reflected,
+        "canonical": grid.canonical,
+        "eq": lambda: grid == other,
+        "le": lambda: grid <= other,
+        "add": lambda: grid + other,
+    }
+
+    def validate():
+        grid._valid = None
+        grid.is_valid()
+
+    statements["validate"] = validate
+
+    if isinstance(grid, UniformGrid):
+        # A commutator move followed by the move on its two new cells restores the grid.
+        if isinstance(grid, UNTiL):
+            pair = next(grid.legal_commutators(), None)
+        else:
+            occupied = set(occupancies)
+            pair = next(
+                ((a, b) for a in occupancies for b in occupancies
+                 if a[0] != b[0] and a[1] != b[1]
+                 and (a[0], b[1]) not in occupied and (b[0], a[1]) not in occupied),
+                None,
+            )
+
+        if pair is not None:
+            (x1, y1), (x2, y2) = pair
+
+            def commutator():
+                grid.commutator((x1, y1), (x2, y2))
+                grid.commutator((x1, y2), (x2, y1))
+
+            statements["commutator"] = commutator
+
+    return statements
+
+def _time(statement, repeat, min_time):
+    """
+    Return the best time in seconds for one call of statement over repeat timing runs.
+
+    The number of calls per run is doubled until a run takes at least min_time seconds.
+    """
+    timer = Timer(statement)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def _exponent(ks, seconds):
+    """
+    Return the slope of the least-squares line through (log k, log seconds).
+
+    None is returned when there are fewer than two distinct k.
+    """
+    if len(set(ks)) < 2:
+        return None
+    xs = [math.log(k) for k in ks]
+    ys = [math.log(t) for t in seconds]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    sxx = sum((x - x_mean) ** 2 for x in xs)
+    sxy = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+    return sxy / sxx
+
+def run(sizes, classes=None, operations=None, repeat=3, min_time=0.02, seed=0):
+    """
+    Time the operations of the grid classes over a range of side lengths.
+
+    Parameters
+    -------------
+    sizes: iterable[int]
+        Side lengths n to time.
+
+    classes: iterable[str] or None
+        Names of the classes to time, keys of CLASSES, by default all of them.
+
+    operations: iterable[str] or None
+        Names of the operations to time, members of OPERATIONS, by default all of them.
+
+    repeat: int
+        Number of timing runs per measurement, of which the fastest is kept, by default 3.
+
+    min_time: float
+        Shortest duration in seconds of a timing run, by default 0.02.
+
+    seed: int
+        Seed for the synthetic random grids, by default 0.
+
+    Returns
+    ----------
+    dict
+        A "meta" entry describing the run, and a "results" entry mapping "Class.operation" to a
+        dict with lists "n", "k" and "seconds" and the "exponent" fitted against k.
+    """
+    classes = list(CLASSES) if classes is None else list(classes)
+    operations = list(OPERATIONS) if operations is None else list(operations)
+    rng = random.Random(seed)
+    results = {}
+
+    for name in classes:
+        cls = CLASSES[name]
+        for n in sorted(sizes):
+            occupancies = _occupancies(cls, n, rng)
+            if occupancies is None:
+                continue
+
+            statements = _statements(cls, n, occupancies)
+            for operation in operations:
+                if operation not in statements:
+                    continue
+                entry = results.setdefault(
+                    f"{name}.{operation}", {"n": [], "k": [], "seconds": []},
+                )
+                entry["n"].append(n)
+                entry["k"].append(len(occupancies))
+                entry["seconds"].append(_time(statements[operation], repeat, min_time))
+
+    for entry in results.values():
+        entry["exponent"] = _exponent(entry["k"], entry["seconds"])
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+def compare(results, baseline, threshold=0.25):
+    """
+    Return the operations of results that are slower than baseline by more than threshold.
+
+    Parameters
+    -------------
+    results, baseline: dict
+        Outputs of run, or the JSON files written from them.
+
+    threshold: float
+        Allowed fractional slowdown, by default 0.25.
+
+    Returns
+    ----------
+    dict[str, float]
+        Map from each regressed operation to the geometric mean of its time ratios against the
+        baseline, over the side lengths timed in both.
+    """
+    regressions = {}
+    for key, entry in results["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+
+        old_seconds = dict(zip(old["n"], old["seconds"]))
+        logs = [
+            math.log(t / old_seconds[n]) for n, t in zip(entry["n"], entry["seconds"])
+            if n in old_seconds
+        ]
+        if not logs:
+            continue
+
+        ratio = math.exp(sum(logs) / len(logs))
+        if ratio > 1 + threshold:
+            regressions[key] = ratio
+    return regressions
+
+def plot(results, path):
+    """
+    Save a log-log plot of the time per call against k, one line per operation, to path.
+
+    Requires matplotlib, which is imported here so that the rest of the module does not need it.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 7))
+    for key, entry in sorted(results["results"].items()):
+        exponent = entry["exponent"]
+        label = key if exponent is None else f"{key}: O(k^{exponent:.2f})"
+        ax.loglog(entry["k"], entry["seconds"], marker="o", label=label)
+
+    ax.set_xlabel("Number of occupancies k")
+    ax.set_ylabel("Time per call (seconds)")
+    ax.set_title("Runtimes for grid classes")
+    ax.grid(True)
+    ax.legend(fontsize="x-small", ncol=2)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+def _parse_args(argv):
+    """
+    Return the parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m until.bench", description="Benchmark the until grid classes.",
+    )
+    parser.add_argument("--n-min", type=int, default=4, help="smallest side length (default 4)")
+    parser.add_argument("--n-max", type=int, default=64, help="largest side length (default 64)")
+    parser.add_argument(
+        "--synthetic", type=int, nargs="*", default=list(DEFAULT_SYNTHETIC),
+        help="side lengths beyond the samples to time with synthetic grids",
+    )
+    parser.add_argument("--classes", nargs="+", choices=list(CLASSES), help="classes to time")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, help="operations to time")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per measurement")
+    parser.add_argument(
+        "--min-time", type=float, default=0.02, help="shortest timing run in seconds",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed for synthetic grids")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25,
+        help="fractional slowdown against the baseline that counts as a regression (default 0.25)",
+    )
+    parser.add_argument("--plot", help="save a log-log plot to this image file (needs matplotlib)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Run the benchmarks from the command line and return the exit status.
+
+    The status is 1 if some operation regresses against the baseline, and 0 otherwise.
+    """
+    args = _parse_args(argv)
+    sample_sizes = {
+        len(occupancies) // 2
+        for occupancies in until_occupancies + samples.corpus_until_occupancies
+    }
+    sizes = [n for n in sample_sizes | set(args.synthetic) if args.n_min <= n <= args.n_max]
+
+    results = run(sizes, args.classes, args.operations, args.repeat, args.min_time, args.seed)
+
+    for key, entry in results["results"].items():
+        exponent = entry["exponent"]
+        shown = "-" if exponent is None else f"{exponent:.2f}"
+        print(f"{key:32} n={entry['n'][0]}..{entry['n'][-1]:<4} exponent in k {shown}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.plot:
+        try:
+            plot(results, args.plot)
+        except ImportError:
+            print("Plotting needs matplotlib, so no plot was saved.", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, ratio in sorted(regressions.items()):
+            print(f"REGRESSION {key}: {ratio:.2f}x the baseline")
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
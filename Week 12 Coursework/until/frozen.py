@@ -0,0 +1,238 @@
+"""
+Immutable, hashable variants of the grid classes for the until package.
+
+A frozen grid is validated exactly as its mutable counterpart, but every method that would change
+its occupancies raises an OperatorError instead. Because a frozen grid cannot change, its hash is
+computed once, from the side length and the occupancy bitboard, and stored on the instance. Frozen
+grids can therefore be kept in sets and used as dictionary keys, for example to deduplicate
+search results.
+
+Classes
+----------
+FrozenGrid
+    Immutable Grid.
+
+FrozenUniformGrid
+    Immutable UniformGrid.
+
+FrozenNTiL
+    Immutable NTiL.
+
+FrozenUNTiL
+    Immutable UNTiL.
+"""
+
+from .grids import Grid, UniformGrid, NTiL, UNTiL
+from .exceptions import OperatorError
+
+class FrozenGrid(Grid):
+    """
+    Represent an immutable, hashable occupancy grid.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    occupancies: list[tuple[int, int]]
+        Coordinates of the occupied cells.
+
+    Methods
+    ----------
+    add_occupancy(coords)
+        Raise an error, since frozen grids cannot be changed.
+
+    del_occupancy(coords)
+        Raise an error, since frozen grids cannot be changed.
+
+    __hash__()
+        Return the hash computed when the grid was created.
+
+    __eq__(h)
+        Test whether this grid has the same size and occupied cells as h.
+
+    __le__(h)
+        Test whether this grid is a subset of h.
+
+    __ge__(h)
+        Test whether this grid is a superset of h.
+
+    Notes
+    --------
+    Frozen grids compare equal to any grid with the same side length and occupied cells, whatever
+    its class, so equal grids always have equal hashes. FrozenGrid inherits the remaining public
+    methods of Grid, whose results are ordinary mutable grids.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, n, occupancies, **kwargs):
+        """
+        Initialise the grid with the validating initialiser of the mutable class, then hash it.
+
+        Parameters
+        -------------
+        n: int
+            Side length of the grid.
+
+        occupancies: list[tuple[int, int]]
+            Coordinates of occupied cells.
+
+        **kwargs
+            Further keyword arguments for the initialiser of the mutable class.
+
+        Attributes
+        -------------
+            _hash: int
+                Hash of the side length and the occupancy bitboard.
+        """
+        super().__init__(n, occupancies, **kwargs)
+        self._hash = hash((self._n, self._bits))
+
+    def add_occupancy(self, coords):
+        """
+        Disallow addition of occupancies.
+
+        Raises
+        ---------
+        OperatorError
+            Always, because frozen grids cannot be changed.
+        """
+        raise OperatorError('Cannot change the occupancies of a frozen grid.')
+
+    def del_occupancy(self, coords):
+        """
+        Disallow deletion of occupancies.
+
+        Raises
+        ---------
+        OperatorError
+            Always, because frozen grids cannot be changed.
+        """
+        raise OperatorError('Cannot change the occupancies of a frozen grid.')
+
+    def __hash__(self):
+        """
+        This method returns the hash stored when the grid was created.
+        """
+        return self._hash
+
+    def __eq__(self, h):
+        """
+        This method checks whether two grids are equal.
+
+        Two grids are equal if they have the same size and the same occupied cells. Grids of
+        different sizes are simply unequal.
+
+        Parameters
+        -------------
+        h: Grid
+            Grid to compare with this grid.
+
+        Returns
+        ----------
+        bool
+            True if the grids have the same size and the same occupied cells, otherwise False.
+
+        Notes
+        --------
+        When h is also frozen, differing hashes settle the comparison without looking at the
+        occupancies.
+        """
+        if self is h:
+            return True
+        if isinstance(h, FrozenGrid) and self._hash != h._hash:
+            return False
+        if not isinstance(h, Grid):
+            return NotImplemented
+        return self._n == h._n and self._bits == h._bits
+
+    def __le__(self, h):
+        """
+        This method checks whether the occupancies of this grid are a subset of h.
+
+        Parameters
+        -------------
+        h: Grid
+            Grid to compare with this grid.
+
+        Returns
+        ----------
+        bool
+            True if every occupied cell in this grid is also occupied in h, otherwise False.
+
+        Raises
+        ---------
+        OperatorError
+            If the two grids do not have the same side length.
+        """
+        if self._n != h._n:
+            raise OperatorError('Error: Grids must be of matching size.')
+        return self._bits & h._bits == self._bits
+
+    def __ge__(self, h):
+        """
+        This method checks whether the occupancies of this grid are a superset of h.
+
+        Parameters
+        -------------
+        h: Grid
+            Grid to compare with this grid.
+
+        Returns
+        ----------
+        bool
+            True if every occupied cell in h is also occupied in this grid, otherwise False.
+
+        Raises
+        ---------
+        OperatorError
+            If the two grids do not have the same side length.
+        """
+        if self._n != h._n:
+            raise OperatorError('Error: Grids must be of matching size.')
+        return self._bits & h._bits == h._bits
+
+class FrozenUniformGrid(FrozenGrid, UniformGrid):
+    """
+    Represent an immutable, hashable uniform grid.
+
+    The uniformity condition is checked on creation by UniformGrid, and the commutator move is
+    disallowed along with the other occupancy changes.
+
+    Methods
+    ----------
+    commutator(coords1, coords2)
+        Raise an error, since frozen grids cannot be changed.
+    """
+
+    __slots__ = ()
+
+    def commutator(self, coords1, coords2):
+        """
+        Disallow commutator moves.
+
+        Raises
+        ---------
+        OperatorError
+            Always, because frozen grids cannot be changed.
+        """
+        raise OperatorError('Cannot change the occupancies of a frozen grid.')
+
+class FrozenNTiL(FrozenGrid, NTiL):
+    """
+    Represent an immutable, hashable No Three in Line grid.
+
+    The NTiL condition is checked on creation by NTiL.
+    """
+
+    __slots__ = ()
+
+class FrozenUNTiL(FrozenUniformGrid, UNTiL):
+    """
+    Represent an immutable, hashable grid satisfying both uniformity and NTiL.
+
+    Both conditions are checked on creation by UNTiL.
+    """
+
+    __slots__ = ()
@@ -7,6 +7,12 @@ structural conditions on them.
 The base class, Grid, stores an n x n grid whose cells are either occupied or vacant. It supports 
 string representation, copying, reflections, rotation, comparison operations, and XOR-style addition.
 
+The occupancies of a grid are kept in order as a compact array of flat indices row * n + col,
+with a dict from each index to its position, so that reading, adding and removing a single cell
+take O(1) time. Addition, equality and subset tests use a bitboard, a single Python int in which
+cell (row, col) is bit row * n + col, built on first use and dropped when a cell changes. The
+grid classes use __slots__, so that millions of grids can be held in memory at once.
+
 Additional Specialised Subclasses
 -------------------------------------
 
@@ -19,12 +25,27 @@ NTiL
 UNTiL
     A grid satisfying the NTiL and the uniformity condition.
 
-The helper function til is used to test whether three points lie on a single straight line.
+The helper function til is used to test whether three points lie on a single straight line. The
+NTiL validation itself buckets points by their gcd-reduced direction from an anchor point, which
+finds any three points in a line in O(k^2) time for k occupancies.
 """
 
+from array import array
 from itertools import combinations
+from math import gcd
+from random import Random
 from .exceptions import OccupancyError, OperatorError
 
+def _typecode(n):
+    """
+    Return the smallest array typecode that can hold the flat index of every cell of an n x n grid.
+    """
+    if n * n <= 1 << 16:
+        return 'H'
+    if n * n <= 1 << 32:
+        return 'I'
+    return 'Q'
+
 class Grid:
     """
     A class to represent an n x n grid with occupied and vacant cells.
@@ -42,6 +63,10 @@ class Grid:
 
     Grid(n=..., occupancies=[(r1, c1), (r2, c2), ...])
 
+    Grids already known to be valid, such as the output of the search module, can skip validation
+    with the class method from_trusted, and passing lazy=True to any constructor defers validation
+    until is_valid() is first called.
+
     Attributes
     -------------
     occupancies: list[tuple[int, int]]
@@ -49,6 +74,12 @@ class Grid:
 
     Methods
     ----------
+    from_trusted(n, occupancies)
+        Build a grid without validating its occupancies.
+
+    is_valid()
+        Test, once, whether the grid satisfies the conditions of its class.
+
     get_row(i)
         Return a copy of row i.
 
@@ -70,6 +101,12 @@ class Grid:
     rotated()
         Return the clockwise rotation of the grid.
 
+    canonical()
+        Return the lexicographically smallest image of the grid under the symmetries of the square.
+
+    symmetry_group()
+        Return the names of the symmetries of the square that leave the grid unchanged.
+
     __str__()
         Return a human-readable string representation of the grid.
 
@@ -89,7 +126,13 @@ class Grid:
         Test whether this grid is a superset of h.
     """
 
-    def __init__(self, n, occupancies):
+    # Every attribute used by the subclasses is declared here, since FrozenGrid is combined with
+    # NTiL and UNTiL through multiple inheritance and at most one base may add slots.
+    __slots__ = (
+        '_n', '_occupancies', '_positions', '_board', '_valid', '_lines', '_hash', '_rows', '_cols',
+    )
+
+    def __init__(self, n, occupancies, lazy=False):
         """
         This method initialises instances of Grid
 
@@ -101,28 +144,253 @@ class Grid:
         occupancies: list[tuple[int, int]]
             Coordinates of the occupied cells given as (row, column) pairs.
 
+        lazy: bool
+            Whether to defer validation until is_valid() is called, by default False.
+
         Attributes
         -------------
             _n: int
                 Grid Dimension.
 
-            _occupancies: list[tuple[int, int]]
-                List of occupied coordinates (row, col).
+            _occupancies: array.array
+                Flat indices row * n + col of the occupied coordinates, in order.
+
+            _positions: dict[int, int]
+                Map from each flat index to its position in _occupancies.
+
+            _board: int or None
+                Bitboard of the grid, where cell (row, col) is bit row * n + col, or None if it
+                has not been built since the grid was created or last changed.
+
+            _valid: bool or None
+                Whether the grid satisfies the conditions of its class, or None if it has not
+                been checked yet.
+
+        Raises
+        ---------
+        IndexError
+            If any coordinate lies outside the grid.
 
-            _rows: list[list[bool]]
-                Boolean grid representation.
+        OccupancyError
+            If lazy is False and the grid breaks a condition of its class.
 
         Notes
         --------
-        The occupancy information is stored both as a coordinate list and as a Boolean matrix
-        for convenient access.
+        The occupancy information is stored as an array of flat indices, which preserves the
+        order used by __repr__ and uses two bytes per occupancy for n up to 256, and as a dict
+        from each index to its position, which answers cell look-ups in O(1) time. Removals swap
+        the last occupancy into the vacated position, which _positions finds in O(1) time, so the
+        order of the occupancies can change when cells are vacated.
+
+        The bitboard used by the whole-grid operations takes n^2 / 8 bytes, so it is only built,
+        by _bitboard in O(k + n^2 / 8) time, when one of them first needs it, and it is dropped
+        rather than rewritten when a single cell changes.
+
+        Validation is delegated to the _validate method of the class of the instance, so each
+        subclass checks its conditions exactly once, here, whatever its parent classes.
+
+        The cells are stored by _build, and read and changed through _has, _insert, _discard,
+        and _commute, which the sparse grids of until.sparse override to keep per-row and
+        per-column sets as well.
         """
         self._n = n
-        self._occupancies = occupancies.copy()
-        self._rows = [[False]*self._n for _ in range(self._n)]
-        for row, col in self._occupancies:
-            self._rows[row][col] = True
-    
+        self._occupancies = array(_typecode(n))
+        self._positions = {}
+        self._board = None
+        self._build(occupancies)
+
+        self._valid = None
+        if not lazy:
+            self._validate()
+            self._valid = True
+
+    @classmethod
+    def from_trusted(cls, n, occupancies):
+        """
+        This method builds a grid from occupancies known to satisfy the conditions of cls.
+
+        Parameters
+        -------------
+        n: int
+            Side length of the grid.
+
+        occupancies: list[tuple[int, int]]
+            Coordinates of the occupied cells, which are not checked.
+
+        Returns
+        ----------
+        Grid
+            Instance of cls marked as valid.
+
+        Notes
+        --------
+        Passing occupancies that break the conditions of cls gives a grid whose methods may
+        behave incorrectly, so only use this for grids produced by a trusted source, such as
+        the search module or a verified corpus.
+        """
+        grid = cls(n, occupancies, lazy=True)
+        grid._valid = True
+        return grid
+
+    def _validate(self):
+        """
+        This method raises an OccupancyError if the grid breaks a condition of its class.
+
+        A plain Grid has no conditions, so this does nothing. Subclasses override it with their
+        own checks.
+        """
+
+    def is_valid(self):
+        """
+        This method tests whether the grid satisfies the conditions of its class.
+
+        Returns
+        ----------
+        bool
+            True if the grid is valid, otherwise False.
+
+        Notes
+        --------
+        The result is cached, so validation runs at most once, on the first call for a grid
+        created with lazy=True. Grids created normally or with from_trusted are already known to
+        be valid.
+        """
+        if self._valid is None:
+            try:
+                self._validate()
+                self._valid = True
+            except OccupancyError:
+                self._valid = False
+        return self._valid
+
+    def _append(self, index):
+        """
+        This method appends a flat index to the occupancy array, keeping _positions up to date.
+        """
+        self._occupancies.append(index)
+        self._positions[index] = len(self._occupancies) - 1
+
+    def _remove(self, index):
+        """
+        This method removes a flat index from the occupancy array in O(1) time.
+
+        The last entry of the array is moved into the position of the removed one.
+        """
+        occupancies = self._occupancies
+        position = self._positions.pop(index)
+        last = occupancies.pop()
+        if position < len(occupancies):
+            occupancies[position] = last
+            self._positions[last] = position
+
+    def _build(self, occupancies):
+        """
+        This method stores the occupancies of a new grid in the occupancy array and _positions.
+
+        Raises
+        ---------
+        IndexError
+            If any coordinate lies outside the grid.
+        """
+        n = self._n
+        for row, col in occupancies:
+            if not (0 <= row < n and 0 <= col < n):
+                raise IndexError('Grid coordinates out of range.')
+            self._append(row * n + col)
+
+    @property
+    def _bits(self):
+        """
+        This method returns the bitboard of the grid, building it if the grid has changed since
+        it was last built.
+        """
+        if self._board is None:
+            self._board = _bitboard(self._occupancies, self._n)
+        return self._board
+
+    def _has(self, coords):
+        """
+        This method tests whether the cell at coords is occupied.
+
+        Raises
+        ---------
+        IndexError
+            If the coordinate lies outside the grid.
+        """
+        row, col = coords
+        n = self._n
+        if not (0 <= row < n and 0 <= col < n):
+            raise IndexError('Grid coordinates out of range.')
+        return row * n + col in self._positions
+
+    def _insert(self, coords):
+        """
+        This method occupies the cell at coords, which must be vacant.
+        """
+        self._append(coords[0] * self._n + coords[1])
+        self._board = None
+
+    def _discard(self, coords):
+        """
+        This method vacates the cell at coords, which must be occupied.
+        """
+        self._remove(coords[0] * self._n + coords[1])
+        self._board = None
+
+    def _commute(self, coords1, coords2):
+        """
+        This method moves the occupancies at coords1 and coords2 to the opposite corners of their
+        rectangle, after checking that the move is possible.
+
+        The four cells are tested in _positions, so the move takes O(1) time.
+
+        Raises
+        ---------
+        OccupancyError
+            If either input coordinate is vacant, or either target coordinate is occupied.
+
+        IndexError
+            If any of the four cells lies outside the grid.
+        """
+        x1, y1 = coords1
+        x2, y2 = coords2
+
+        if not self._has(coords1) or not self._has(coords2):
+            raise OccupancyError('Both input coordinates must be occupied.')
+
+        if self._has((x1, y2)) or self._has((x2, y1)):
+            raise OccupancyError('Both target coordinates must be vacant.')
+
+        n = self._n
+        self._remove(x1 * n + y1)
+        self._remove(x2 * n + y2)
+        self._append(x1 * n + y2)
+        self._append(x2 * n + y1)
+        self._board = None
+
+    def _line_counts(self):
+        """
+        This method returns the numbers of occupied cells in each row and in each column.
+
+        Returns
+        ----------
+        tuple[list[int], list[int]]
+            Lists of length n whose entry i counts the occupied cells of row i and of column i.
+
+        Notes
+        --------
+        The counts are taken from the distinct flat indices of the occupancy array in O(n + k)
+        time, rather than by slicing rows and columns out of the n^2-bit bitboard.
+        """
+        n = self._n
+        rows = [0] * n
+        cols = [0] * n
+        for index in set(self._occupancies):
+            row, col = divmod(index, n)
+            rows[row] += 1
+            cols[col] += 1
+        return rows, cols
+
     def __repr__(self):
         """
         This method returns a string representation suitable for debugging.
@@ -132,13 +400,14 @@ class Grid:
         """
         class_name = self.__class__.__name__
 
-        return f"{class_name}(n={self._n}, occupancies={self._occupancies})"
+        return f"{class_name}(n={self._n}, occupancies={self.occupancies})"
     
     def __str__(self):
         """
         This method returns a human readable drawing of the grid.
 
-        The grid is drawn row-by-row, with cells separated by a single space.
+        The grid is drawn row-by-row, with cells separated by a single space. The occupancies are
+        placed into the rows of the drawing in a single pass.
 
         Key
         ------
@@ -147,11 +416,12 @@ class Grid:
         """
         vacant = "□"
         occupied = "■"
-        lines = []
+        n = self._n
+        rows = [[vacant] * n for _ in range(n)]
 
-        for row in self._rows:           
-            lines.append(" ".join(occupied if cell else vacant for cell in row))
-        return "\n".join(lines)
+        for row, col in self.occupancies:
+            rows[row][col] = occupied
+        return "\n".join(" ".join(cells) for cells in rows)
     
     @property
     def occupancies(self):
@@ -165,10 +435,10 @@ class Grid:
 
         Notes
         --------
-        The copy is returned so that external code cannot directly modify the
-        internal occupancy list.
+        The coordinates are decoded from the internal array of flat indices, so external code
+        cannot directly modify the occupancies of the grid.
         """
-        return self._occupancies.copy()
+        return [divmod(index, self._n) for index in self._occupancies]
     
     def get_row(self, i):
         """
@@ -183,8 +453,16 @@ class Grid:
         ----------
         list[bool]
             Copy of row i, where True indicates an occupied cell and False a vacant cell.
+
+        Notes
+        --------
+        The row is looked up cell by cell in _positions, so every call returns a new list in
+        O(n) time.
         """
-        return self._rows[i].copy()
+        n = self._n
+        start = range(n)[i] * n
+        positions = self._positions
+        return [start + c in positions for c in range(n)]
     
     def add_occupancy(self, coords:tuple[int, int]):
         """
@@ -202,16 +480,13 @@ class Grid:
         
         Notes
         --------
-            If the cell is currently vacant, it is set to True in _rows and the
-            coordinate is appended to _occupancies.  
+            If the cell is currently vacant, its flat index is appended to
+            _occupancies.  
                 
             If the cell is already occupied, raises an OccupancyError.
         """
-        row, col = coords
-
-        if not self._rows[row][col]:
-            self._rows[row][col] = True
-            self._occupancies.append(coords)
+        if not self._has(coords):
+            self._insert(coords)
 
         else:
             raise OccupancyError('Box at given coordinates already occupied.')
@@ -232,15 +507,15 @@ class Grid:
         
         Notes
         --------
-            If the cell is currently occupied, it is set to False in _rows and the
-            coordinate is removed from _occupancies.  
+            If the cell is currently occupied, its flat index is removed from
+            _occupancies in O(1) time, by moving the last occupancy into its place.  
             
             If the cell is already vacant, raises an OccupancyError.
         """
-        row, col = coords
-        if self._rows[row][col]:
-            self._rows[row][col] = False
-            self._occupancies.remove(coords)
+        if self._has(coords):
+            self._discard(coords)
+            if self._valid is False:
+                self._valid = None
         
         else:
             raise OccupancyError('Box at given coordinates already vacant.')
@@ -256,9 +531,9 @@ class Grid:
 
         Notes
         --------
-        The occupancy list is copied so that the new Grid has its own list object.
+        The new Grid has its own occupancy array.
         """
-        return Grid(self._n, self._occupancies.copy())
+        return Grid(self._n, self.occupancies)
     
     def v_reflected(self):
         """
@@ -270,13 +545,8 @@ class Grid:
             New grid obtained by reflecting the current grid top to bottom.
         """
         n = self._n
-        new_occupancies = []
-
-        for r, row in enumerate(self._rows):
-            for c, cell in enumerate(row):
-                if cell:
-                    new_occupancies.append((n - 1 - r, c))
-
+        new_occupancies = [(n - 1 - r, c) for r, c in _decode(self._bits, n)]
+        
         return Grid(n, new_occupancies)
     
     def h_reflected(self):
@@ -289,12 +559,7 @@ class Grid:
             New grid obtained by reflecting the current grid left to right.
         """
         n = self._n
-        new_occupancies = []
-
-        for r, row in enumerate(self._rows):
-            for c, cell in enumerate(row):
-                if cell:
-                    new_occupancies.append((r, n - 1 - c))
+        new_occupancies = [(r, n - 1 - c) for r, c in _decode(self._bits, n)]
         
         return Grid(n, new_occupancies)
     
@@ -308,15 +573,47 @@ class Grid:
             New grid obtained by rotating the current grid clockwise.
         """
         n = self._n
-        new_occupancies = []
-
-        for r, row in enumerate(self._rows):
-            for c, cell in enumerate(row):
-                if cell:
-                    new_occupancies.append((c, n - 1 - r))
+        new_occupancies = [(c, n - 1 - r) for r, c in _decode(self._bits, n)]
         
         return Grid(n, new_occupancies)
     
+    def canonical(self):
+        """
+        This method returns the canonical image of the grid under the symmetries of the square.
+
+        The 8 rotations and reflections of the square are applied to the occupied coordinates and
+        the image whose sorted occupancy list is lexicographically smallest is returned, so two
+        grids are related by a symmetry if and only if they have equal canonical forms.
+
+        Returns
+        ----------
+        Grid
+            New grid whose occupancies are the smallest image, in row-major order.
+
+        Notes
+        --------
+        Only the coordinate lists of the images are built, not 8 intermediate Grid objects.
+        """
+        return Grid(self._n, list(_canonical_key(self._n, self.occupancies)))
+
+    def symmetry_group(self):
+        """
+        This method returns the stabiliser of the grid in the symmetry group of the square.
+
+        Returns
+        ----------
+        list[str]
+            Names of the symmetries that map the grid onto itself, always including "identity".
+            The names are the keys of D4: "identity", "rotated", "rotated_180", "rotated_270",
+            "h_reflected", "v_reflected", "transposed" and "anti_transposed".
+        """
+        n = self._n
+        occupied = set(self.occupancies)
+        return [
+            name for name, transform in D4.items()
+            if all(_transform(n, coords, transform) in occupied for coords in occupied)
+        ]
+
     def __add__(self, h):
         """
         Return the XOR-style sum of two grids of the same size.
@@ -343,12 +640,7 @@ class Grid:
             raise OperatorError('Error: Grids must be of matching size.')
         
         n = self._n
-        new_occupancies = []
-
-        for r in range(n):
-            for c in range(n):
-                if self._rows[r][c] ^ h._rows[r][c]:
-                    new_occupancies.append((r, c))
+        new_occupancies = _decode(self._bits ^ h._bits, n)
 
         return Grid(n, new_occupancies)
         
@@ -380,7 +672,7 @@ class Grid:
             print('Error: Grids must be of matching size.')
             return None
 
-        if sorted(self._occupancies) == sorted(h._occupancies):      
+        if self._bits == h._bits:      
             return True
         else:
             return False
@@ -413,7 +705,7 @@ class Grid:
             print('Error: Grids must be of matching size.')
             return None
 
-        if set(self._occupancies).issubset(h._occupancies):         
+        if not self._bits & ~h._bits:         
             return True
         
         else:
@@ -447,7 +739,7 @@ class Grid:
             print('Error: Grids must be of matching size.')
             return None
 
-        if set(h._occupancies).issubset(self._occupancies):         
+        if not h._bits & ~self._bits:         
             return True
         
         else:
@@ -478,6 +770,9 @@ class UniformGrid(Grid):
 
     Methods
     ----------
+    random(n, seed=None)
+        Return a random uniform grid.
+
     add_occupancy(coords)
         Raise an error, since direct occupancy changes may break uniformity.
 
@@ -492,7 +787,9 @@ class UniformGrid(Grid):
     UniformGrid inherits the remaining public methods of Grid.
     """
 
-    def __init__(self, n, occupancies):
+    __slots__ = ()
+
+    def __init__(self, n, occupancies, lazy=False):
         """
         Initialises a uniform grid and validates its row and column counts
         
@@ -503,26 +800,89 @@ class UniformGrid(Grid):
             
         occupancies: list[tuple[int, int]]
             Coordinates of occupied cells.
+
+        lazy: bool
+            Whether to defer validation until is_valid() is called, by default False.
         
         Raises
         ---------
         OccupancyError
             If any row or any column does not contain exactly two occupied cells.
         """
-        Grid.__init__(self, n, occupancies)  
+        Grid.__init__(self, n, occupancies, lazy)
 
-        for row in self._rows:
-            if row.count(True) != 2:
-                raise OccupancyError('Each row and column must have exactly two occupancies.')
+    @classmethod
+    def random(cls, n, seed=None):
+        """
+        This method returns a random uniform grid of side length n in O(n) expected time.
 
-        for c in range(self._n):
-            col_count = 0
-            for r in range(self._n):
-                if self._rows[r][c]:
-                    col_count += 1
-            
-            if col_count != 2:
-                raise OccupancyError('Each row and column must have exactly two occupancies.')
+        Parameters
+        -------------
+        n: int
+            Side length of the grid, at least 2.
+
+        seed: int, random.Random or None
+            Seed for the random choices, or a random number generator to draw them from, by
+            default unseeded.
+
+        Returns
+        ----------
+        UniformGrid
+            Instance of cls, whose occupancies are in row-major order.
+
+        Raises
+        ---------
+        ValueError
+            If n is less than 2, since there is then no uniform grid.
+
+        OccupancyError
+            If cls adds conditions to uniformity, as UNTiL does, and the random grid breaks them.
+
+        Notes
+        --------
+        Row i is occupied in columns perm[i] and perm[d[i]], where perm is a random permutation
+        and d a random derangement. The derangement is found by rejection, which needs e
+        shuffles on average, and guarantees that the two columns of each row differ. Each of the
+        two permutations uses every column once, so the grid is uniform by construction and is
+        built with from_trusted rather than revalidated, unless cls has further conditions to
+        check. Every uniform grid can arise, but not with exactly equal probability.
+
+        The bitboard that the grid builds for its transforms and comparisons takes n^2 / 8 bytes,
+        which bounds n in practice to around ten thousand. SparseUniformGrid.random of
+        until.sparse never builds one.
+        """
+        if n < 2:
+            raise ValueError('A uniform grid must have side length at least 2.')
+
+        rng = seed if isinstance(seed, Random) else Random(seed)
+        perm = list(range(n))
+        rng.shuffle(perm)
+        d = list(range(n))
+        while True:
+            rng.shuffle(d)
+            if all(d[i] != i for i in range(n)):
+                break
+
+        occupancies = []
+        for i in range(n):
+            c1 = perm[i]
+            c2 = perm[d[i]]
+            if c1 > c2:
+                c1, c2 = c2, c1
+            occupancies.append((i, c1))
+            occupancies.append((i, c2))
+
+        if cls._validate is not UniformGrid._validate:
+            return cls(n, occupancies)
+        return cls.from_trusted(n, occupancies)
+
+    def _validate(self):
+        """
+        This method raises an OccupancyError unless every row and column holds two occupancies.
+        """
+        rows, cols = self._line_counts()
+        if any(count != 2 for count in rows) or any(count != 2 for count in cols):
+            raise OccupancyError('Each row and column must have exactly two occupancies.')
 
     def add_occupancy(self, coords):
         """
@@ -572,24 +932,87 @@ class UniformGrid(Grid):
         each affected row and column still contains the same number of
         occupancies as before.
         """
-        x1, y1 = coords1
-        x2, y2 = coords2
+        self._commute(coords1, coords2)
+        if self._valid is False:
+            self._valid = None
 
-        if (not self._rows[x1][y1]) or (not self._rows[x2][y2]):
-            raise OccupancyError('Both input coordinates must be occupied.')
-        
-        if self._rows[x1][y2] or self._rows[x2][y1]:
-            raise OccupancyError('Both target coordinates must be vacant.')
+def _bitboard(indices, n):
+    """
+    Return the bitboard of an n x n grid whose occupied cells have the given flat indices.
+
+    The bits are set in a byte array that is converted to an int once, which takes
+    O(k + n^2 / 8) time for k indices, since setting each bit of an int directly would copy all
+    n^2 bits every time.
+    """
+    cells = bytearray((n * n + 7) // 8)
+    for index in indices:
+        cells[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(cells, 'little')
+
+def _decode(bits, n):
+    """
+    Decode a bitboard into its occupied coordinates in row-major order.
 
-        self._rows[x1][y1] = False
-        self._rows[x2][y2] = False
-        self._rows[x1][y2] = True
-        self._rows[x2][y1] = True
+    Parameters
+    -------------
+    bits: int
+        Bitboard in which cell (row, col) is bit row * n + col.
 
-        self._occupancies.remove((x1, y1))
-        self._occupancies.remove((x2, y2))
-        self._occupancies.append((x1, y2))
-        self._occupancies.append((x2, y1))
+    n: int
+        Side length of the grid.
+
+    Returns
+    ----------
+    list[tuple[int, int]]
+        Occupied coordinates, sorted by row and then by column.
+    """
+    digits = bin(bits)[:1:-1]
+    occupancies = []
+    i = digits.find('1')
+    while i != -1:
+        occupancies.append(divmod(i, n))
+        i = digits.find('1', i + 1)
+    return occupancies
+
+# Each symmetry of the square as (swap, flip_row, flip_col): a cell is first transposed if swap is
+# set, and then its row and column are reflected according to flip_row and flip_col.
+D4 = {
+    "identity": (False, False, False),
+    "rotated": (True, False, True),
+    "rotated_180": (False, True, True),
+    "rotated_270": (True, True, False),
+    "h_reflected": (False, False, True),
+    "v_reflected": (False, True, False),
+    "transposed": (True, False, False),
+    "anti_transposed": (True, True, True),
+}
+
+def _transform(n, coords, transform):
+    """
+    Return the image of a cell of an n x n grid under a symmetry given as a value of D4.
+    """
+    swap, flip_row, flip_col = transform
+    row, col = coords
+    if swap:
+        row, col = col, row
+    if flip_row:
+        row = n - 1 - row
+    if flip_col:
+        col = n - 1 - col
+    return row, col
+
+def _canonical_key(n, occupancies):
+    """
+    Return the lexicographically smallest sorted image of the occupancies under D4, as a tuple.
+
+    Two occupancy lists give the same key exactly when one is a rotation or reflection of the
+    other, so the key can be used to deduplicate grids up to symmetry.
+    """
+    occupied = set(occupancies)
+    return min(
+        tuple(sorted(_transform(n, coords, transform) for coords in occupied))
+        for transform in D4.values()
+    )
 
 def til(pt1, pt2, pt3):
     """
@@ -601,6 +1024,120 @@ def til(pt1, pt2, pt3):
         return False
     return (pt1[0] - pt2[0]) * (pt2[1] - pt3[1]) == (pt2[0] - pt3[0]) * (pt1[1] - pt2[1])
 
+def _direction(pt1, pt2):
+    """
+    Return the normalised direction of the line through two distinct points.
+
+    The difference pt2 - pt1 is divided by the gcd of its entries and its sign is fixed so that
+    the row step is positive, or the row step is zero and the column step positive. Two points
+    therefore share a direction from pt1 exactly when they lie on a common line through pt1.
+    """
+    dr = pt2[0] - pt1[0]
+    dc = pt2[1] - pt1[1]
+    g = gcd(dr, dc)
+    dr //= g
+    dc //= g
+    if dr < 0 or (dr == 0 and dc < 0):
+        return -dr, -dc
+    return dr, dc
+
+def _collinear_pair(pt, others):
+    """
+    Return two points from others that lie in a straight line with pt.
+
+    Parameters
+    -------------
+    pt: tuple[int, int]
+        Anchor point.
+
+    others: iterable[tuple[int, int]]
+        Points to test against the anchor.
+
+    Returns
+    ----------
+    tuple[tuple[int, int], tuple[int, int]] or None
+        The first pair found on a common line through pt, or None if there is no such pair.
+
+    Notes
+    --------
+    Points are bucketed by their direction from pt, so the search takes time linear in the
+    number of points. Points equal to pt, or repeated, never form a line, as in til.
+    """
+    buckets = {}
+    for other in others:
+        if other == pt:
+            continue
+        direction = _direction(pt, other)
+        seen = buckets.get(direction)
+        if seen is None:
+            buckets[direction] = other
+        elif seen != other:
+            return seen, other
+    return None
+
+def _line(pt1, pt2):
+    """
+    Return a hashable key for the line through two distinct points.
+
+    The key is the normalised direction of the line together with the offset dc * row - dr * col,
+    which is the same for every point on the line.
+    """
+    dr, dc = _direction(pt1, pt2)
+    return dr, dc, dc * pt1[0] - dr * pt1[1]
+
+def _find_til(occupancies):
+    """
+    Return three occupancies lying in a straight line, or None if there are none.
+
+    Each point is used in turn as an anchor for the points after it, so every line is found from
+    its first point and the whole search takes O(k^2) time with O(k) memory.
+    """
+    for i, anchor in enumerate(occupancies):
+        pair = _collinear_pair(anchor, occupancies[i + 1:])
+        if pair is not None:
+            return (anchor,) + pair
+    return None
+
+def _target_lines(target, removed, occupancies, lines):
+    """
+    Return the lines from target to the occupancies that remain once the points in removed are gone.
+
+    Parameters
+    -------------
+    target: tuple[int, int]
+        Vacant cell that is about to be occupied.
+
+    removed: tuple[tuple[int, int], ...]
+        Occupancies that are about to be vacated.
+
+    occupancies: list[tuple[int, int]]
+        Current occupancies, which must satisfy the NTiL condition.
+
+    lines: dict[tuple[int, int, int], tuple[tuple[int, int], tuple[int, int]]]
+        Map from each line spanned by two occupancies to that pair, as in the NTiL line index.
+
+    Returns
+    ----------
+    set[tuple[int, int, int]] or None
+        The keys of the lines from target to each remaining occupancy, or None if target lies on
+        a line through two remaining occupancies.
+
+    Notes
+    --------
+    Every indexed line holds exactly two occupancies, so target is blocked exactly when one of its
+    lines is indexed and neither of the two points on it is being removed.
+    """
+    seen = set()
+    for pt in occupancies:
+        if pt in removed:
+            continue
+        line = _line(target, pt)
+        pair = lines.get(line)
+        if pair is not None and pair[0] not in removed and pair[1] not in removed:
+            return None
+        seen.add(line)
+    return seen
+
 class NTiL(Grid):
     """
     Represent a No Three in Line (NTiL) occupancy grid.
@@ -617,6 +1154,9 @@ class NTiL(Grid):
     occupancies : list[tuple[int, int]]
         Coordinates of the occupied cells.
 
+    line_index : bool
+        Whether to maintain an index of the lines spanned by pairs of occupied cells.
+
     Attributes
     -------------
     occupancies : list[tuple[int, int]]
@@ -627,11 +1167,17 @@ class NTiL(Grid):
     add_occupancy(coords)
         Add an occupancy only if doing so preserves the NTiL condition.
 
+    del_occupancy(coords)
+        Vacate an occupied cell, keeping the line index up to date.
+
     Notes
     --------
     NTiL inherits the remaining public methods of Grid.
     """
-    def __init__(self, n, occupancies):
+
+    __slots__ = ()
+
+    def __init__(self, n, occupancies, line_index=False, lazy=False):
         """
         Initialise a No Three in Line grid and validate its occupancies.
         
@@ -643,17 +1189,47 @@ class NTiL(Grid):
         occupancies: list[tuple[int, int]]
             Coordinates of occupied cells.
 
+        line_index: bool
+            Whether to build and maintain the line index, by default False.
+
+        lazy: bool
+            Whether to defer validation until is_valid() is called, by default False.
+
+        Attributes
+        -------------
+            _lines: dict[tuple[int, int, int], tuple[tuple[int, int], tuple[int, int]]] or None
+                Map from each line spanned by two occupied cells to that pair of cells, or None
+                if the index is not maintained.
+
         Raises
         ---------
         OccupancyError
-            If any three occupied cells lie on a straight line.
-        """
-        Grid.__init__(self, n, occupancies)
+            If any three occupied cells lie on a straight line. The message names one such triple.
 
-        for pt1, pt2, pt3 in combinations(self._occupancies, 3):
-            if til(pt1, pt2, pt3):
-                raise OccupancyError('Cannot have three occupancies in a straight line.')
+        Notes
+        --------
+        Since no three occupied cells share a line, every indexed line holds exactly one pair,
+        and the index has k(k - 1)/2 entries for k occupancies.
+        """
+        Grid.__init__(self, n, occupancies, lazy)
+
+        self._lines = None
+        if line_index:
+            self._lines = {}
+            for pt1, pt2 in combinations(self.occupancies, 2):
+                if pt1 != pt2:
+                    self._lines[_line(pt1, pt2)] = (pt1, pt2)
     
+    def _validate(self):
+        """
+        This method raises an OccupancyError naming three occupancies in a straight line, if any.
+        """
+        triple = _find_til(self.occupancies)
+        if triple is not None:
+            raise OccupancyError(
+                'Cannot have three occupancies in a straight line: {}, {}, {}.'.format(*triple)
+            )
+
     def add_occupancy(self, coords: tuple[int, int]):
         """
         Add an occupancy while preserving the NTiL property
@@ -669,18 +1245,51 @@ class NTiL(Grid):
             If the cell is already occupied, or if adding it would create
             three occupied cells in a straight line.
 
+        Notes
+        --------
+        The new cell is only compared with each existing occupancy, so the check takes O(k) time.
+        With the line index, each line through the new cell and an existing occupancy is looked
+        up among the indexed lines; otherwise the existing occupancies are bucketed by direction.
         """
-        row, col = coords
-
-        if self._rows[row][col]:
+        if self._has(coords):
             raise OccupancyError('Box at given coordinates already occupied.')
-        
-        for pt1, pt2 in combinations(self._occupancies, 2):
-            if til(pt1, pt2, coords):
+
+        if self._lines is None:
+            pair = _collinear_pair(coords, self.occupancies)
+            if pair is not None:
                 raise OccupancyError('Cannot have three occupancies in a straight line.')
 
-        self._rows[row][col] = True
-        self._occupancies.append(coords)
+        else:
+            new_lines = {}
+            for pt in self.occupancies:
+                line = _line(pt, coords)
+                if line in self._lines or line in new_lines:
+                    raise OccupancyError('Cannot have three occupancies in a straight line.')
+                new_lines[line] = (pt, coords)
+            self._lines.update(new_lines)
+
+        self._insert(coords)
+
+    def del_occupancy(self, coords: tuple[int, int]):
+        """
+        Vacate an occupied cell and drop its lines from the line index.
+
+        Parameters
+        -------------
+        coords: tuple[int, int]
+            Coordinate of the cell to vacate.
+
+        Raises
+        ---------
+        OccupancyError
+            If the specified cell is already vacant.
+        """
+        Grid.del_occupancy(self, coords)
+
+        if self._lines is not None:
+            for pt in self.occupancies:
+                if pt != coords:
+                    self._lines.pop(_line(pt, coords), None)
 
 class UNTiL(UniformGrid, NTiL):
     """
@@ -697,16 +1306,30 @@ class UNTiL(UniformGrid, NTiL):
     occupancies : list[tuple[int, int]]
         Coordinates of the occupied cells.
 
+    line_index : bool
+        Whether to maintain an index of the lines spanned by pairs of occupied cells.
+
     Attributes
     -------------
     occupancies : list[tuple[int, int]]
         A copy of the occupied coordinates of the grid.
 
+    Methods
+    ----------
+    commutator(coords1, coords2)
+        Perform a commutator move only if the result still satisfies the NTiL condition.
+
+    legal_commutators()
+        Yield every commutator move that keeps the grid an UNTiL grid.
+
     Notes
     --------
-    UNTiL inherits its public methods from UniformGrid and NTiL.
+    UNTiL inherits its remaining public methods from UniformGrid and NTiL.
     """
-    def __init__(self, n, occupancies):
+
+    __slots__ = ()
+
+    def __init__(self, n, occupancies, line_index=False, lazy=False):
         """
         Initialise a grid satisfying both specialised conditions
 
@@ -717,8 +1340,126 @@ class UNTiL(UniformGrid, NTiL):
 
         occupancies: list[tuple[int, int]]
             Coordinates of occupied cells.
+
+        line_index: bool
+            Whether to build the line index, which commutator then keeps up to date and
+            legal_commutators reads in place of recomputing the lines, by default False.
+
+        lazy: bool
+            Whether to defer validation until is_valid() is called, by default False.
+
+        Raises
+        ---------
+        OccupancyError
+            If the grid is not uniform, or has three occupancies in a straight line.
+
+        Notes
+        --------
+        The grid is built once by NTiL.__init__, whose call to Grid.__init__ checks uniformity
+        and then the NTiL condition through _validate, rather than once by each parent
+        initialiser.
+        """
+        NTiL.__init__(self, n, occupancies, line_index, lazy)
+
+    def _validate(self):
+        """
+        This method raises an OccupancyError if the grid is not uniform or not NTiL.
+        """
+        UniformGrid._validate(self)
+        NTiL._validate(self)
+
+    def commutator(self, coords1: tuple[int, int], coords2: tuple[int, int]):
+        """
+        Perform a commutator move while preserving the NTiL property.
+
+        Parameters
+        -------------
+        coords1: tuple[int, int]
+            First occupied coordinate.
+
+        coords2: tuple[int, int]
+            Second occupied coordinate.
+
+        Raises
+        ---------
+        OccupancyError
+            If either input coordinate is not occupied, if either target coordinate is already
+            occupied, or if the move would create three occupied cells in a straight line. The
+            grid is left unchanged.
+
+        Notes
+        --------
+        Only the two new cells can complete a line, so each is compared with the remaining
+        occupancies by bucketing them by direction, and the check takes O(k) time. If the grid
+        was created with line_index=True, the lines through the two vacated cells are then
+        dropped from the index and those through the two new cells added, also in O(k) time.
         """
-        UniformGrid.__init__(self, n, occupancies)
-        NTiL.__init__(self, n, occupancies)
+        new1 = (coords1[0], coords2[1])
+        new2 = (coords2[0], coords1[1])
+
+        if (
+            self._has(coords1) and self._has(coords2)
+            and not self._has(new1) and not self._has(new2)
+        ):
+            remaining = [pt for pt in self.occupancies if pt != coords1 and pt != coords2]
+            if (
+                _collinear_pair(new1, remaining) is not None
+                or _collinear_pair(new2, remaining + [new1]) is not None
+            ):
+                raise OccupancyError('Cannot have three occupancies in a straight line.')
+
+        UniformGrid.commutator(self, coords1, coords2)
 
+        if self._lines is not None:
+            occupancies = self.occupancies
+            for old in (coords1, coords2):
+                for pt in occupancies:
+                    self._lines.pop(_line(pt, old), None)
+            self._lines.pop(_line(coords1, coords2), None)
+            for new in (new1, new2):
+                for pt in occupancies:
+                    if pt != new:
+                        self._lines[_line(pt, new)] = (pt, new)
 
+    def legal_commutators(self):
+        """
+        Yield every commutator move that keeps both the uniformity and the NTiL conditions.
+
+        Yields
+        ----------
+        tuple[tuple[int, int], tuple[int, int]]
+            Pairs (coords1, coords2) of occupied cells for which commutator(coords1, coords2)
+            would produce another UNTiL grid. Each move is yielded once, since swapping the two
+            cells gives the same move.
+
+        Notes
+        --------
+        The lines spanned by pairs of occupancies are computed once per call, or taken from the
+        line index if the grid was created with line_index=True. Each of the O(k^2) candidate
+        moves is then checked by looking up the lines from its two new cells to the remaining
+        occupancies, so a full call takes O(k^3) time rather than rebuilding a grid for every
+        candidate. The moves are computed from the occupancies at the time of the call, so the
+        grid should not be changed while the generator is in use.
+        """
+        occupancies = self.occupancies
+        lines = self._lines
+        if lines is None:
+            lines = {_line(pt1, pt2): (pt1, pt2) for pt1, pt2 in combinations(occupancies, 2)}
+
+        for pt1, pt2 in combinations(occupancies, 2):
+            if pt1[0] == pt2[0] or pt1[1] == pt2[1]:
+                continue
+
+            new1 = (pt1[0], pt2[1])
+            new2 = (pt2[0], pt1[1])
+            if self._has(new1) or self._has(new2):
+                continue
+
+            removed = (pt1, pt2)
+            lines1 = _target_lines(new1, removed, occupancies, lines)
+            if lines1 is None or _line(new1, new2) in lines1:
+                continue
+            if _target_lines(new2, removed, occupancies, lines) is None:
+                continue
+
+            yield pt1, pt2
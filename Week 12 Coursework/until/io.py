@@ -0,0 +1,365 @@
+"""
+Compact binary corpus files of uniform grids for the until package.
+
+Every row of a uniform grid holds exactly two occupancies, so a grid of side length n is stored as
+2n column indices: the smaller and then the larger occupied column of each row, in row order, as
+little-endian unsigned 16-bit integers. A corpus file is a fixed 24-byte header followed by these
+fixed-width records, so record i starts at a known offset and can be read without touching the rest
+of the file.
+
+The header holds, in order and little-endian, the magic bytes b'UNTL', the format version (uint16),
+the flags (uint16), the side length n (uint32), the number of records (uint64) and four bytes of
+padding.
+
+Classes
+----------
+CorpusWriter
+    Write uniform grids to a corpus file.
+
+CorpusReader
+    Read a corpus file through a memory map.
+
+Functions
+-----------
+write_corpus(path, n, grids, flags=0)
+    Write an iterable of grids to a corpus file.
+
+Constants
+-----------
+FLAG_UNTIL
+    Header flag recording that every grid in the corpus satisfies the NTiL condition.
+"""
+
+import mmap
+import struct
+
+from .grids import UniformGrid, UNTiL, _find_til
+from .exceptions import OccupancyError
+
+MAGIC = b'UNTL'
+VERSION = 1
+FLAG_UNTIL = 1
+
+_HEADER = struct.Struct('<4sHHIQ4x')
+_COUNT_OFFSET = 12
+
+class CorpusWriter:
+    """
+    Write uniform grids of side length n to a corpus file.
+
+    Parameters
+    -------------
+    path: str or os.PathLike
+        File to create, or overwrite.
+
+    n: int
+        Side length of the grids, between 2 and 65535.
+
+    flags: int
+        Header flags, by default 0. Pass FLAG_UNTIL when every grid written is an UNTiL grid.
+
+    The writer is a context manager, so the usual pattern is
+
+    with CorpusWriter(path, n) as writer:
+        for grid in grids:
+            writer.write(grid)
+
+    Attributes
+    -------------
+    count: int
+        Number of grids written so far.
+
+    Methods
+    ----------
+    write(grid)
+        Append a grid to the corpus.
+
+    close()
+        Record the number of grids in the header and close the file.
+
+    Notes
+    --------
+    The header is written with a count of zero and patched when the writer is closed, so grids
+    can be streamed from a generator without knowing their number in advance.
+    """
+
+    def __init__(self, path, n, flags=0):
+        """
+        This method creates the file and writes a provisional header.
+
+        Raises
+        ---------
+        ValueError
+            If n is outside the range supported by the format.
+        """
+        if not 2 <= n <= 0xFFFF:
+            raise ValueError('Corpus grids must have a side length between 2 and 65535.')
+
+        self._n = n
+        self._until = bool(flags & FLAG_UNTIL)
+        self._record = struct.Struct('<{}H'.format(2 * n))
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, flags, n, 0))
+        self.count = 0
+
+    def write(self, grid):
+        """
+        This method appends a grid to the corpus.
+
+        Parameters
+        -------------
+        grid: Grid or list[tuple[int, int]]
+            Grid of side length n, or its occupancies, with exactly two occupancies in every row
+            and column.
+
+        Raises
+        ---------
+        OccupancyError
+            If some row or column of the grid does not hold exactly two occupancies, or if the
+            corpus has FLAG_UNTIL set and three occupancies of the grid lie in a straight line.
+
+        IndexError
+            If some coordinate lies outside the grid.
+
+        ValueError
+            If grid is a Grid of a different side length.
+        """
+        occupancies = getattr(grid, 'occupancies', grid)
+        n = self._n
+        if getattr(grid, '_n', n) != n:
+            raise ValueError('Grid side length does not match the corpus.')
+
+        # A plain occupancy list has not been checked by any constructor, and a record that is
+        # not uniform would be read back as a valid grid by a trusted reader, so every row and
+        # column is checked before anything is written.
+        rows = [[] for _ in range(n)]
+        col_counts = [0] * n
+        for r, c in occupancies:
+            if not (0 <= r < n and 0 <= c < n):
+                raise IndexError('Grid coordinates out of range.')
+            rows[r].append(c)
+            col_counts[c] += 1
+        # A repeated occupancy is one cell, as in UniformGrid, so its row is one occupancy short.
+        if any(len(cols) != 2 or cols[0] == cols[1] for cols in rows) or any(
+            count != 2 for count in col_counts
+        ):
+            raise OccupancyError('Each row and column must have exactly two occupancies.')
+
+        # A FLAG_UNTIL corpus is read back as UNTiL grids, which a trusted reader marks as valid.
+        if self._until:
+            triple = _find_til([(r, c) for r, cols in enumerate(rows) for c in cols])
+            if triple is not None:
+                raise OccupancyError(
+                    'Cannot have three occupancies in a straight line: {}, {}, {}.'.format(*triple)
+                )
+
+        self._file.write(self._record.pack(*(c for cols in rows for c in sorted(cols))))
+        self.count += 1
+
+    def close(self):
+        """
+        This method records the number of grids in the header and closes the file.
+        """
+        if self._file.closed:
+            return
+        self._file.seek(_COUNT_OFFSET)
+        self._file.write(struct.pack('<Q', self.count))
+        self._file.close()
+
+    def __enter__(self):
+        """
+        This method returns the writer for use in a with statement.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        """
+        This method closes the writer on leaving a with statement.
+        """
+        self.close()
+
+def write_corpus(path, n, grids, flags=0):
+    """
+    Write an iterable of uniform grids of side length n to a corpus file.
+
+    Returns
+    ----------
+    int
+        Number of grids written.
+    """
+    with CorpusWriter(path, n, flags) as writer:
+        for grid in grids:
+            writer.write(grid)
+    return writer.count
+
+class CorpusReader:
+    """
+    Read a corpus file through a read-only memory map.
+
+    Parameters
+    -------------
+    path: str or os.PathLike
+        Corpus file to open.
+
+    grid_class: type or None
+        Class of the grids returned, by default UNTiL if the header has FLAG_UNTIL set and
+        UniformGrid otherwise.
+
+    trusted: bool
+        Whether to build grids with grid_class.from_trusted, skipping validation, by default False.
+        Only set this for corpora written from grids already known to be valid.
+
+    Opening a corpus only reads its header, so it takes the same time whatever the number of
+    grids. The reader is a context manager and a sequence:
+
+    with CorpusReader(path) as corpus:
+        first = corpus[0]
+        for grid in corpus:
+            ...
+
+    Attributes
+    -------------
+    n: int
+        Side length of the grids.
+
+    flags: int
+        Header flags.
+
+    Methods
+    ----------
+    columns(i)
+        Return the raw record of grid i.
+
+    occupancies(i)
+        Return the occupancies of grid i.
+
+    array()
+        Return every record as a zero-copy NumPy array of shape (count, n, 2).
+
+    close()
+        Release the memory map and the file.
+
+    Notes
+    --------
+    Grids are built only when they are indexed or reached by iteration. Building a grid validates
+    it as usual unless trusted is set; for bulk work, array() gives the column indices of every
+    grid without creating any Python objects per grid.
+    """
+
+    def __init__(self, path, grid_class=None, trusted=False):
+        """
+        This method opens the file, maps it into memory and checks the header.
+
+        Raises
+        ---------
+        ValueError
+            If the file is not a corpus of a supported version, or is shorter than its header
+            states.
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError('File is too short to be a corpus.')
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError('File is too short to be a corpus.')
+
+        magic, version, self.flags, self.n, self._count = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('File is not a version {} corpus.'.format(VERSION))
+
+        self._record = struct.Struct('<{}H'.format(2 * self.n))
+        if len(self._mmap) < _HEADER.size + self._count * self._record.size:
+            self.close()
+            raise ValueError('Corpus file is truncated.')
+
+        if grid_class is None:
+            grid_class = UNTiL if self.flags & FLAG_UNTIL else UniformGrid
+        self._build = grid_class.from_trusted if trusted else grid_class
+
+    def __len__(self):
+        """
+        This method returns the number of grids in the corpus.
+        """
+        return self._count
+
+    def columns(self, i):
+        """
+        This method returns the raw record of grid i.
+
+        Returns
+        ----------
+        tuple[int, ...]
+            The 2n occupied column indices, two per row in row order.
+
+        Raises
+        ---------
+        IndexError
+            If i is out of range.
+        """
+        i = range(self._count)[i]
+        return self._record.unpack_from(self._mmap, _HEADER.size + i * self._record.size)
+
+    def occupancies(self, i):
+        """
+        This method returns the occupancies of grid i in row-major order.
+        """
+        cols = self.columns(i)
+        return [(index // 2, c) for index, c in enumerate(cols)]
+
+    def __getitem__(self, i):
+        """
+        This method returns grid i, supporting negative indices.
+        """
+        return self._build(self.n, self.occupancies(i))
+
+    def __iter__(self):
+        """
+        This method yields the grids of the corpus one at a time, in order.
+        """
+        for i in range(self._count):
+            yield self[i]
+
+    def array(self):
+        """
+        This method returns every record as a NumPy array that shares memory with the file.
+
+        Returns
+        ----------
+        numpy.ndarray
+            Read-only array of shape (count, n, 2) and dtype '<u2', whose entry [b, row] holds the
+            two occupied columns of that row of grid b.
+
+        Notes
+        --------
+        Requires NumPy. The reader cannot be closed while arrays returned by this method are
+        still alive, since they are views of the memory map.
+        """
+        import numpy as np
+
+        return np.frombuffer(
+            self._mmap, dtype='<u2', count=self._count * 2 * self.n, offset=_HEADER.size,
+        ).reshape(self._count, self.n, 2)
+
+    def close(self):
+        """
+        This method releases the memory map and closes the file.
+        """
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        """
+        This method returns the reader for use in a with statement.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        """
+        This method closes the reader on leaving a with statement.
+        """
+        self.close()
@@ -0,0 +1,168 @@
+"""
+Opt-in instrumentation of the validation hot paths of the until package.
+
+While profiling is enabled, the functions and methods listed in TARGETS are replaced by wrappers
+that count their calls and accumulate their running time. Disabling profiling puts the original
+functions back, so when it is off the package runs its own code with no instrumentation at all.
+
+Profiling can be switched on and off globally,
+
+    profiling.enable()
+    ...
+    profiling.disable()
+
+or for a block,
+
+    with profiling.profile() as stats:
+        UNTiL(n, occupancies)
+    stats()["ntil_validation.calls"]
+
+NTiL validation finds collinear triples by bucketing points by direction in _collinear_pair,
+so til itself is only counted when it is called directly. Times are inclusive: the time of
+Grid.__init__ includes the validation it runs, and the time of UNTiL.commutator includes the
+UniformGrid.commutator it calls. Counters accumulate across enable() and disable() until reset()
+is called.
+
+Functions
+-----------
+enable()
+    Install the instrumentation.
+
+disable()
+    Remove the instrumentation.
+
+is_enabled()
+    Test whether the instrumentation is installed.
+
+profile(reset_counters=True)
+    Context manager that enables profiling for a block.
+
+counters()
+    Return the counters as a flat dict.
+
+reset()
+    Set every counter back to zero.
+
+Constants
+-----------
+TARGETS
+    The instrumented (owner, attribute, label) triples.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+from . import grids
+
+TARGETS = (
+    (grids, "til", "til"),
+    (grids, "_collinear_pair", "collinear_pair"),
+    (grids.Grid, "__init__", "grid_init"),
+    (grids.UniformGrid, "_validate", "uniform_validation"),
+    (grids.NTiL, "_validate", "ntil_validation"),
+    (grids.Grid, "add_occupancy", "add_occupancy"),
+    (grids.NTiL, "add_occupancy", "ntil_add_occupancy"),
+    (grids.UniformGrid, "commutator", "commutator"),
+    (grids.UNTiL, "commutator", "until_commutator"),
+)
+
+_stats = {label: [0, 0.0] for _, _, label in TARGETS}
+_originals = {}
+
+def _wrap(label, func):
+    """
+    Return a wrapper of func that adds its calls and running time to the counters of label.
+    """
+    stats = _stats[label]
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats[0] += 1
+            stats[1] += perf_counter() - start
+
+    return wrapper
+
+def enable():
+    """
+    Install the instrumentation. Enabling it again while it is installed does nothing.
+    """
+    if _originals:
+        return
+    for owner, name, label in TARGETS:
+        original = vars(owner)[name]
+        _originals[owner, name] = original
+        setattr(owner, name, _wrap(label, original))
+
+def disable():
+    """
+    Remove the instrumentation, restoring the original functions and methods.
+    """
+    for (owner, name), original in _originals.items():
+        setattr(owner, name, original)
+    _originals.clear()
+
+def is_enabled():
+    """
+    Return True if the instrumentation is installed, otherwise False.
+    """
+    return bool(_originals)
+
+def reset():
+    """
+    Set every counter back to zero.
+    """
+    for stats in _stats.values():
+        stats[0] = 0
+        stats[1] = 0.0
+
+def counters():
+    """
+    Return a snapshot of the counters.
+
+    Returns
+    ----------
+    dict[str, int or float]
+        For each label of TARGETS, the entry "<label>.calls" holds the number of calls and
+        "<label>.seconds" their cumulative running time, ready to pass to a metrics exporter.
+    """
+    snapshot = {}
+    for label, (calls, seconds) in _stats.items():
+        snapshot[f"{label}.calls"] = calls
+        snapshot[f"{label}.seconds"] = seconds
+    return snapshot
+
+@contextmanager
+def profile(reset_counters=True):
+    """
+    Enable profiling for the duration of a with block.
+
+    Parameters
+    -------------
+    reset_counters: bool
+        Whether to set the counters to zero on entry, by default True.
+
+    Yields
+    ----------
+    function
+        The function counters, to read the counters during or after the block.
+
+    Notes
+    --------
+    Blocks may be nested. The instrumentation is removed when the outermost block exits, unless
+    it was already enabled globally before that block was entered.
+    """
+    if reset_counters:
+        reset()
+
+    was_enabled = is_enabled()
+    enable()
+    try:
+        yield counters
+    finally:
+        if not was_enabled:
+            disable()
@@ -0,0 +1,726 @@
+"""
+Search routines for finding UNTiL grids.
+
+The enumerator builds a grid by backtracking. Alongside the partial grid it keeps a bitboard of the
+cells that are still open, meaning vacant cells whose row and column both hold fewer than two
+occupancies, and a bitboard of the forbidden cells, meaning those on a line through two placed
+occupancies. A forbidden cell can never be occupied, so only open cells that are not forbidden
+are ever considered.
+
+At each step the search picks the row or column with the fewest ways left to complete it and
+tries each of those ways in turn. It backtracks as soon as some row or column has fewer usable
+cells than occupancies it still needs.
+
+The search can also be restricted to grids that are unchanged by a rotation of the square, which
+shrinks the search space dramatically, and the order of the branches can be randomised. The
+function find_until combines both with restarts to find a single grid quickly.
+
+For a parallel search, the grids are partitioned by the column pairs occupied in their first one
+or two rows. Each such prefix is an independent task for a pool of worker processes, and the
+results are merged as the tasks finish.
+
+Functions
+-----------
+enumerate_until(n, limit=None, time_limit=None, as_grids=True, symmetry=None, seed=None,
+                up_to_symmetry=False)
+    Generate the UNTiL grids of side length n.
+
+enumerate_until_parallel(n, workers=None, prefix_rows=2, limit=None, time_limit=None,
+                         as_grids=True, symmetry=None, up_to_symmetry=False)
+    Generate the UNTiL grids of side length n using a pool of worker processes.
+
+find_until(n, time_limit=None, seed=None, symmetry="auto")
+    Find a single UNTiL grid of side length n.
+
+anneal(n, steps=200000, restarts=10, seed=None, start_temperature=0.6, end_temperature=0.3,
+       time_limit=None)
+    Find a single UNTiL grid of side length n by simulated annealing over uniform grids.
+"""
+
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import combinations, product
+from math import gcd
+
+from .grids import UniformGrid, UNTiL, _canonical_key, _direction
+
+SYMMETRIES = (None, "rotation_180", "rotation_90")
+
+
+class _NodeLimit(Exception):
+    """
+    Raised inside the search when it has visited its permitted number of nodes.
+    """
+
+
+class _Lines:
+    """
+    Cache of the bitboards of the lines through pairs of cells of an n x n grid.
+
+    The bitboard of a line has bit row * n + col set for every cell (row, col) on it, matching
+    the layout used by Grid.
+    """
+
+    def __init__(self, n):
+        """
+        Initialise an empty cache for grids of side length n.
+        """
+        self._n = n
+        self._masks = {}
+
+    def mask(self, pt1, pt2):
+        """
+        Return the bitboard of the line through two cells in different rows and columns.
+        """
+        n = self._n
+        key = (pt1[0] * n + pt1[1]) * n * n + pt2[0] * n + pt2[1]
+        mask = self._masks.get(key)
+        if mask is None:
+            r, c = pt1
+            dr = pt2[0] - r
+            dc = pt2[1] - c
+            g = gcd(dr, dc)
+            dr //= g
+            dc //= g
+            if dr < 0:
+                dr, dc = -dr, -dc
+
+            if dc > 0:
+                steps = min(r // dr, c // dc)
+            else:
+                steps = min(r // dr, (n - 1 - c) // -dc)
+            r -= steps * dr
+            c -= steps * dc
+
+            mask = 0
+            while r < n and 0 <= c < n:
+                mask |= 1 << (r * n + c)
+                r += dr
+                c += dc
+            self._masks[key] = mask
+        return mask
+
+
+def _orbit(n, pt, symmetry):
+    """
+    Return the distinct images of a cell under the rotations allowed by symmetry.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    pt: tuple[int, int]
+        Cell to map.
+
+    symmetry: str or None
+        One of SYMMETRIES.
+
+    Returns
+    ----------
+    list[tuple[int, int]]
+        The cell followed by its other images, without repeats.
+    """
+    r, c = pt
+    if symmetry is None:
+        return [pt]
+    if symmetry == "rotation_180":
+        images = [pt, (n - 1 - r, n - 1 - c)]
+    else:
+        images = [pt, (c, n - 1 - r), (n - 1 - r, n - 1 - c), (n - 1 - c, r)]
+
+    orbit = []
+    for image in images:
+        if image not in orbit:
+            orbit.append(image)
+    return orbit
+
+
+def _choose_line(n, usable, row_counts, col_counts, row_mask, col_mask):
+    """
+    Pick the row or column with the fewest ways left to complete it.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    usable: int
+        Bitboard of the cells that may still be occupied.
+
+    row_counts, col_counts: list[int]
+        Number of occupancies placed in each row and column.
+
+    row_mask, col_mask: int
+        Bitboards of row 0 and of column 0.
+
+    Returns
+    ----------
+    tuple[list[tuple[int, int]], int] or None
+        The usable cells of the chosen row or column and the number of occupancies it still
+        needs, or None if some row or column has fewer usable cells than it needs.
+    """
+    best = None
+    best_ways = None
+
+    for r in range(n):
+        need = 2 - row_counts[r]
+        if need:
+            cells = (usable >> (r * n)) & row_mask
+            count = cells.bit_count()
+            if count < need:
+                return None
+            ways = count if need == 1 else count * (count - 1) // 2
+            if best is None or ways < best_ways:
+                best = ("row", r, cells, need)
+                best_ways = ways
+
+    for c in range(n):
+        need = 2 - col_counts[c]
+        if need:
+            cells = (usable >> c) & col_mask
+            count = cells.bit_count()
+            if count < need:
+                return None
+            ways = count if need == 1 else count * (count - 1) // 2
+            if ways < best_ways:
+                best = ("col", c, cells, need)
+                best_ways = ways
+
+    kind, i, cells, need = best
+    if kind == "row":
+        return [(i, c) for c in range(n) if cells >> c & 1], need
+    return [(r, i) for r in range(n) if cells >> (r * n) & 1], need
+
+
+def _search(n, prefix=(), deadline=None, symmetry=None, rng=None, node_limit=None):
+    """
+    Generate every UNTiL grid of side length n that contains the given occupancies.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    prefix: iterable[tuple[int, int]]
+        Occupancies every generated grid must contain.
+
+    deadline: float or None
+        Value of time.monotonic() after which the search stops, or None for no limit.
+
+    symmetry: str or None
+        One of SYMMETRIES. If given, only grids unchanged by that rotation are generated.
+
+    rng: random.Random or None
+        Source of randomness for the branch order, or None to search in a fixed order.
+
+    node_limit: int or None
+        Maximum number of search nodes to visit, or None for no limit.
+
+    Yields
+    --------
+    list[tuple[int, int]]
+        Occupancies of each grid found, in row-major order.
+
+    Raises
+    ---------
+    TimeoutError
+        If the deadline passes before the search is finished.
+
+    _NodeLimit
+        If the node limit is reached before the search is finished.
+
+    Notes
+    --------
+    Each branch adds the occupancies still needed by one row or column, together with their
+    images under symmetry. The cells of that row or column in a grid determine the branch it is
+    found in, so every grid is generated exactly once.
+    """
+    lines = _Lines(n)
+    row_mask = (1 << n) - 1
+    col_mask = int(('0' * (n - 1) + '1') * n, 2)
+    placed = []
+    row_counts = [0] * n
+    col_counts = [0] * n
+    nodes = 0
+
+    def place(pts, forbidden, open_cells):
+        """
+        Occupy each cell of pts in turn, returning how many were placed and the new bitboards.
+
+        The bitboards are None if some cell of pts could not be occupied.
+        """
+        added = 0
+        for pt in pts:
+            r, c = pt
+            bit = 1 << (r * n + c)
+            if not open_cells & bit or forbidden & bit:
+                return added, None, None
+
+            for q in placed:
+                if q[0] != r and q[1] != c:
+                    forbidden |= lines.mask(q, pt)
+            placed.append(pt)
+            added += 1
+
+            open_cells &= ~bit
+            row_counts[r] += 1
+            col_counts[c] += 1
+            if row_counts[r] == 2:
+                open_cells &= ~(row_mask << (r * n))
+            if col_counts[c] == 2:
+                open_cells &= ~(col_mask << c)
+        return added, forbidden, open_cells
+
+    def unplace(added):
+        """
+        Remove the last added occupancies.
+        """
+        for _ in range(added):
+            r, c = placed.pop()
+            row_counts[r] -= 1
+            col_counts[c] -= 1
+
+    def extend(forbidden, open_cells):
+        nonlocal nodes
+        if len(placed) == 2 * n:
+            yield sorted(placed)
+            return
+
+        nodes += 1
+        if node_limit is not None and nodes > node_limit:
+            raise _NodeLimit
+        if deadline is not None and nodes % 256 == 0 and time.monotonic() > deadline:
+            raise TimeoutError
+
+        choice = _choose_line(n, open_cells & ~forbidden, row_counts, col_counts,
+                              row_mask, col_mask)
+        if choice is None:
+            return
+
+        cells, need = choice
+        branches = list(combinations(cells, need))
+        if rng is not None:
+            rng.shuffle(branches)
+
+        for branch in branches:
+            pts = []
+            for pt in branch:
+                pts.extend(image for image in _orbit(n, pt, symmetry) if image not in pts)
+
+            added, new_forbidden, new_open = place(pts, forbidden, open_cells)
+            if new_forbidden is not None:
+                yield from extend(new_forbidden, new_open)
+            unplace(added)
+
+    pts = []
+    for pt in prefix:
+        pts.extend(image for image in _orbit(n, pt, symmetry) if image not in pts)
+    _, forbidden, open_cells = place(pts, 0, (1 << (n * n)) - 1)
+    if forbidden is not None:
+        yield from extend(forbidden, open_cells)
+
+
+def _check_symmetry(symmetry):
+    """
+    Raise ValueError if symmetry is not one of SYMMETRIES.
+    """
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f'symmetry must be one of {SYMMETRIES}, not {symmetry!r}.')
+
+
+def enumerate_until(n, limit=None, time_limit=None, as_grids=True, symmetry=None, seed=None,
+                    up_to_symmetry=False):
+    """
+    Generate the UNTiL grids of side length n by backtracking search.
+
+    Solutions are yielded as soon as they are found, so the caller can stop the search at any
+    point simply by no longer iterating.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    limit: int or None
+        Maximum number of solutions to yield, by default no limit.
+
+    time_limit: float or None
+        Number of seconds after which the search stops, by default no limit.
+
+    as_grids: bool
+        Whether to yield UNTiL instances rather than occupancy lists, by default True.
+
+    symmetry: str or None
+        If "rotation_180" or "rotation_90", only grids unchanged by that rotation are generated.
+        By default every grid is generated.
+
+    seed: int or None
+        Seed for randomising the order in which branches are tried, by default a fixed order.
+
+    up_to_symmetry: bool
+        Whether to yield only the first grid found from each class of grids related by a rotation
+        or reflection of the square, by default False.
+
+    Yields
+    --------
+    UNTiL or list[tuple[int, int]]
+        Each UNTiL grid found, or its occupancies in row-major order if as_grids is False.
+
+    Raises
+    ---------
+    ValueError
+        If symmetry is not recognised.
+
+    Notes
+    --------
+    Running out of time ends the generator quietly, as does reaching the solution limit. Every
+    solution is yielded exactly once, whatever the seed. Unless up_to_symmetry is set, solutions
+    related by a symmetry of the square are yielded separately; otherwise the canonical form of
+    each class is remembered, so memory grows with the number of classes found.
+    """
+    _check_symmetry(symmetry)
+    if limit is not None and limit <= 0:
+        return
+
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    rng = None if seed is None else random.Random(seed)
+    seen = set()
+    found = 0
+
+    try:
+        for occupancies in _search(n, deadline=deadline, symmetry=symmetry, rng=rng):
+            if up_to_symmetry:
+                key = _canonical_key(n, occupancies)
+                if key in seen:
+                    continue
+                seen.add(key)
+            yield UNTiL.from_trusted(n, occupancies) if as_grids else occupancies
+            found += 1
+            if limit is not None and found >= limit:
+                return
+    except TimeoutError:
+        return
+
+
+def _search_prefix(n, prefix, symmetry, limit, stop_time):
+    """
+    Return the grids of side length n containing prefix, for use as a worker process task.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    prefix: list[tuple[int, int]]
+        Occupancies every returned grid must contain.
+
+    symmetry: str or None
+        One of SYMMETRIES.
+
+    limit: int or None
+        Maximum number of grids to return, or None for no limit.
+
+    stop_time: float or None
+        Value of time.time() at which to stop searching, or None for no limit.
+
+    Returns
+    ----------
+    list[list[tuple[int, int]]]
+        Occupancies of the grids found before the limit or the stop time was reached.
+
+    Notes
+    --------
+    The stop time is given on the wall clock, since monotonic clocks of different processes
+    need not agree.
+    """
+    deadline = None if stop_time is None else time.monotonic() + (stop_time - time.time())
+    found = []
+    try:
+        for occupancies in _search(n, prefix, deadline=deadline, symmetry=symmetry):
+            found.append(occupancies)
+            if limit is not None and len(found) >= limit:
+                break
+    except TimeoutError:
+        pass
+    return found
+
+
+def enumerate_until_parallel(n, workers=None, prefix_rows=2, limit=None, time_limit=None,
+                             as_grids=True, symmetry=None, up_to_symmetry=False):
+    """
+    Generate the UNTiL grids of side length n, searching in a pool of worker processes.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    workers: int or None
+        Number of worker processes, by default the number of CPUs.
+
+    prefix_rows: int
+        Number of leading rows, 1 or 2, whose column pairs define the tasks, by default 2.
+
+    limit: int or None
+        Maximum number of solutions to yield, by default no limit.
+
+    time_limit: float or None
+        Number of seconds after which the search stops, by default no limit.
+
+    as_grids: bool
+        Whether to yield UNTiL instances rather than occupancy lists, by default True.
+
+    symmetry: str or None
+        If "rotation_180" or "rotation_90", only grids unchanged by that rotation are generated.
+        By default every grid is generated.
+
+    up_to_symmetry: bool
+        Whether to yield only the first grid found from each class of grids related by a rotation
+        or reflection of the square, by default False.
+
+    Yields
+    --------
+    UNTiL or list[tuple[int, int]]
+        Each UNTiL grid found, or its occupancies in row-major order if as_grids is False.
+
+    Raises
+    ---------
+    ValueError
+        If symmetry is not recognised, or prefix_rows is not 1 or 2.
+
+    Notes
+    --------
+    Every grid has exactly one choice of column pairs in its leading rows, so the tasks never
+    overlap and each solution is still yielded exactly once, though in no fixed order.
+
+    There are C(n, 2) ** prefix_rows tasks, far more than there are workers, and the pool hands
+    each worker a new task as soon as it finishes the last. A worker that draws a large subtree
+    therefore holds up only that task while the others drain the queue, which balances the load
+    much as work stealing would. Only a few tasks per worker are submitted at a time, so memory
+    stays bounded however many tasks there are. If the caller stops iterating early, queued
+    tasks are cancelled but tasks already running are left to finish in the background.
+    """
+    _check_symmetry(symmetry)
+    if prefix_rows not in (1, 2):
+        raise ValueError('prefix_rows must be 1 or 2.')
+    if limit is not None and limit <= 0:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    stop_time = None if time_limit is None else time.time() + time_limit
+    pairs = list(combinations(range(n), 2))
+    prefixes = (
+        [(row, col) for row, pair in enumerate(choice) for col in pair]
+        for choice in product(pairs, repeat=min(prefix_rows, n))
+    )
+    seen = set()
+    found = 0
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        while True:
+            while len(pending) < 4 * workers:
+                prefix = next(prefixes, None)
+                if prefix is None:
+                    break
+                pending.add(executor.submit(_search_prefix, n, prefix, symmetry, limit, stop_time))
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for occupancies in future.result():
+                    if up_to_symmetry:
+                        key = _canonical_key(n, occupancies)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    yield UNTiL.from_trusted(n, occupancies) if as_grids else occupancies
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+
+            if stop_time is not None and time.time() > stop_time:
+                return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def find_until(n, time_limit=None, seed=None, symmetry="auto"):
+    """
+    Find a single UNTiL grid of side length n by randomised search with restarts.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    time_limit: float or None
+        Number of seconds after which to give up, by default no limit.
+
+    seed: int or None
+        Seed for the random branch order, by default unseeded.
+
+    symmetry: str or None
+        Rotation the grid must be unchanged by. By default "auto", which picks "rotation_90" for
+        even n and "rotation_180" for odd n. Symmetric grids are far quicker to find, but may not
+        exist for every n.
+
+    Returns
+    ----------
+    UNTiL or None
+        A grid found by the search, or None if the time limit ran out first or no grid with the
+        requested symmetry exists.
+
+    Raises
+    ---------
+    ValueError
+        If symmetry is not recognised.
+
+    Notes
+    --------
+    Each attempt is a randomly ordered search that is abandoned after a budget of nodes, which
+    avoids spending a long time in a fruitless part of the search tree. The budget grows by a
+    tenth after every attempt, so given enough time the final attempt is exhaustive.
+    """
+    if symmetry == "auto":
+        symmetry = "rotation_90" if n % 2 == 0 else "rotation_180"
+    _check_symmetry(symmetry)
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    rng = random.Random(seed)
+    budget = 1000
+
+    while True:
+        try:
+            for occupancies in _search(n, deadline=deadline, symmetry=symmetry, rng=rng,
+                                       node_limit=budget):
+                return UNTiL.from_trusted(n, occupancies)
+            return None
+        except _NodeLimit:
+            budget += budget // 10
+        except TimeoutError:
+            return None
+
+
+def _triples_through(pt, others):
+    """
+    Return the number of pairs from others lying in a straight line with pt.
+
+    Points are bucketed by their direction from pt, and a bucket of m points contributes
+    m(m - 1)/2 pairs, so this is the number of collinear triples that contain pt.
+    """
+    buckets = {}
+    for other in others:
+        direction = _direction(pt, other)
+        buckets[direction] = buckets.get(direction, 0) + 1
+    return sum(m * (m - 1) // 2 for m in buckets.values())
+
+
+def _collinear_triples(occupancies):
+    """
+    Return the number of collinear triples among the occupancies, counting each triple at its
+    first point.
+    """
+    return sum(
+        _triples_through(pt, occupancies[i + 1:]) for i, pt in enumerate(occupancies)
+    )
+
+
+def anneal(n, steps=200000, restarts=10, seed=None, start_temperature=0.6, end_temperature=0.3,
+           time_limit=None):
+    """
+    Find a single UNTiL grid of side length n by simulated annealing over uniform grids.
+
+    Each run starts from a random UniformGrid and repeatedly proposes a commutator move on two
+    occupancies, the first preferably one that lies on a collinear triple. A grid is scored by its
+    number of collinear triples, and a move that changes the score by delta is accepted with
+    probability min(1, exp(-delta / T)), where the temperature T falls geometrically from
+    start_temperature to end_temperature over the run.
+    Commutator moves preserve uniformity, so a grid with score zero is an UNTiL grid.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid, at least 2.
+
+    steps: int
+        Number of proposed moves in each run, by default 200000.
+
+    restarts: int
+        Number of runs from fresh random grids before giving up, by default 10.
+
+    seed: int or None
+        Seed for the random starting grids and moves, by default unseeded.
+
+    start_temperature, end_temperature: float
+        Temperatures at the start and end of each run, by default 0.6 and 0.3.
+
+    time_limit: float or None
+        Number of seconds after which to give up, by default no limit.
+
+    Returns
+    ----------
+    UNTiL or None
+        A grid with no collinear triples, or None if no run reached one.
+
+    Notes
+    --------
+    The score is updated incrementally. Only the triples through the two vacated and the two new
+    occupancies change, and each of those four counts is found in O(k) time by bucketing the
+    other occupancies by direction, rather than revalidating the whole grid.
+
+    The problem gets hard quickly: with the default settings most runs succeed for n up to about
+    12, but local search rarely reaches a solution beyond that. For larger n, find_until is
+    usually the better tool.
+    """
+    rng = random.Random(seed)
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    cooling = (end_temperature / start_temperature) ** (1 / max(steps - 1, 1))
+
+    for _ in range(restarts):
+        grid = UniformGrid.random(n, rng)
+        occupancies = grid.occupancies
+        score = _collinear_triples(occupancies)
+        temperature = start_temperature
+
+        for step in range(steps):
+            if score == 0:
+                return UNTiL.from_trusted(n, grid.occupancies)
+            if deadline is not None and step % 256 == 0 and time.monotonic() > deadline:
+                return None
+
+            temperature *= cooling
+            for _ in range(8):
+                a = rng.choice(occupancies)
+                others = [pt for pt in occupancies if pt != a]
+                removed = _triples_through(a, others)
+                if removed:
+                    break
+
+            b = rng.choice(others)
+            c = (a[0], b[1])
+            d = (b[0], a[1])
+            if a[0] == b[0] or a[1] == b[1] or grid._has(c) or grid._has(d):
+                continue
+
+            others.remove(b)
+            delta = (
+                _triples_through(c, others) + _triples_through(d, others + [c])
+                - removed - _triples_through(b, others)
+            )
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                grid.commutator(a, b)
+                occupancies.remove(a)
+                occupancies.remove(b)
+                occupancies.extend((c, d))
+                score += delta
+
+        if score == 0:
+            return UNTiL.from_trusted(n, grid.occupancies)
+
+    return None
@@ -0,0 +1,589 @@
+"""
+Local HTTP/JSON validation service for the until package.
+
+The service keeps the package imported and a pool of worker processes warm, so that callers in
+other processes or languages can validate grids without paying for the import on every check. Run
+it as
+
+    python -m until.server --port 8765
+
+and post one grid per request,
+
+    curl -s localhost:8765/validate -d '{"class": "UNTiL", "n": 4, "occupancies": [[0, 0], ...]}'
+
+which answers {"valid": true, "error": null}, or {"valid": false, "error": "..."} with the message
+of the OccupancyError raised by the class. The endpoints are
+
+    POST /validate
+        Validate one grid. "class" is a key of until.validation.CLASSES, by default "UNTiL".
+
+    GET /metrics
+        Counters and latency histograms of the service, as JSON.
+
+    GET /health
+        {"status": "ok"} while the service is running.
+
+Concurrent requests are coalesced before they reach the workers. Identical requests that arrive
+while one of them is waiting or running share its result, and the others are gathered into
+batches of up to batch_size grids, each of which is one task for the worker pool. At most two
+batches per worker run at once, so while the workers are busy new requests queue up and form the
+next, larger batch. The queue holds at most max_pending grids, and requests that find it full are
+answered at once with status 503 and a Retry-After header rather than being left to wait, which
+is the backpressure a load test will see when it outruns the workers.
+
+The service binds to 127.0.0.1 by default and has no authentication, so it is meant to run
+locally or behind a proxy that adds both.
+
+Classes
+----------
+LatencyHistogram
+    Cumulative histogram of durations.
+
+ValidationServer
+    The asyncio validation service.
+
+Functions
+-----------
+main(argv=None)
+    Run the service from the command line.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .validation import CLASSES, _validate_chunk
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+def _ignore_interrupt():
+    """
+    Make a worker process ignore SIGINT, so that Ctrl-C stops the service through the main process
+    alone.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class _HTTPError(Exception):
+    """
+    Error answered with an HTTP status and a JSON error message.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class LatencyHistogram:
+    """
+    Record durations in a cumulative histogram with fixed bucket bounds.
+
+    Parameters
+    -------------
+    bounds: iterable[float]
+        Upper bounds of the buckets in seconds, by default from 0.5 ms to 10 s in steps of about
+        a factor of two.
+
+    Methods
+    ----------
+    observe(seconds)
+        Add a duration to the histogram.
+
+    snapshot()
+        Return the histogram as a dict that can be written as JSON.
+    """
+
+    DEFAULT_BOUNDS = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    )
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        """
+        This method initialises instances of LatencyHistogram.
+        """
+        self._bounds = tuple(sorted(bounds))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+
+    def observe(self, seconds):
+        """
+        This method adds a duration in seconds to the histogram.
+        """
+        self._counts[bisect_left(self._bounds, seconds)] += 1
+        self._sum += seconds
+
+    def snapshot(self):
+        """
+        This method returns the histogram as a dict.
+
+        Returns
+        ----------
+        dict
+            "buckets" maps the upper bound of each bucket, and "+Inf", to the number of durations
+            at most that bound, as in a Prometheus histogram. "count" and "sum" are the number
+            and total of the durations, and "mean" their mean, or None if there are none.
+        """
+        buckets = {}
+        total = 0
+        for bound, count in zip(self._bounds + (float("inf"),), self._counts):
+            total += count
+            buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = total
+        return {
+            "buckets": buckets,
+            "count": total,
+            "sum": self._sum,
+            "mean": self._sum / total if total else None,
+        }
+
+def _parse(body):
+    """
+    Return the (class name, n, occupancies) key of a /validate request body.
+
+    Raises
+    ---------
+    _HTTPError
+        With status 400 if the body is not a well-formed request.
+    """
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        raise _HTTPError(400, "Error: Request body must be JSON.") from None
+    if not isinstance(request, dict):
+        raise _HTTPError(400, "Error: Request body must be a JSON object.")
+
+    name = request.get("class", "UNTiL")
+    if name not in CLASSES:
+        raise _HTTPError(400, f"Error: class must be one of {list(CLASSES)}.")
+
+    n = request.get("n")
+    if type(n) is not int or n < 1:
+        raise _HTTPError(400, "Error: n must be a positive integer.")
+
+    occupancies = request.get("occupancies")
+    if not isinstance(occupancies, list) or not all(
+        isinstance(p, list) and len(p) == 2 and type(p[0]) is int and type(p[1]) is int
+        for p in occupancies
+    ):
+        raise _HTTPError(400, "Error: occupancies must be a list of [row, col] integer pairs.")
+
+    return name, n, tuple(map(tuple, occupancies))
+
+class ValidationServer:
+    """
+    Serve grid validation over HTTP, coalescing concurrent requests into batches for a process pool.
+
+    Parameters
+    -------------
+    host: str
+        Address to bind, by default "127.0.0.1".
+
+    port: int
+        Port to bind, by default 8765. With 0, a free port is chosen, which the port attribute
+        gives once the server has started.
+
+    workers: int or None
+        Number of worker processes, by default the number of CPUs.
+
+    batch_size: int
+        Largest number of grids sent to a worker in one task, by default 256.
+
+    batch_delay: float
+        Seconds to wait for more requests before sending a batch that is not full, by default
+        0.002. With 0, a batch is sent as soon as a worker is free.
+
+    max_pending: int
+        Largest number of grids waiting for a worker, by default 4096.
+
+    max_body: int
+        Largest request body in bytes, by default 16 MiB.
+
+    Use it from a running event loop as
+
+    server = ValidationServer(port=0)
+    await server.start()
+    ...
+    await server.close()
+
+    or as an async context manager. The workers are not forked from the calling process, so a
+    script that starts a server must do so under if __name__ == "__main__", as for any
+    multiprocessing code.
+
+    Attributes
+    -------------
+    port: int
+        The bound port.
+
+    Methods
+    ----------
+    start()
+        Start the worker pool and begin accepting connections.
+
+    serve_forever()
+        Accept connections until cancelled.
+
+    close()
+        Stop accepting connections and shut down the worker pool.
+
+    metrics()
+        Return the counters and latency histograms.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, workers=None, batch_size=256,
+                 batch_delay=0.002, max_pending=4096, max_body=2 ** 24):
+        """
+        This method initialises instances of ValidationServer.
+
+        Raises
+        ---------
+        ValueError
+            If batch_size or max_pending is less than 1.
+        """
+        if batch_size < 1 or max_pending < 1:
+            raise ValueError('batch_size and max_pending must be at least 1.')
+
+        self._host = host
+        self._port = port
+        self._workers = workers or os.cpu_count() or 1
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._max_body = max_body
+
+        self._queue = asyncio.Queue(max_pending)
+        self._inflight = {}
+        self._tasks = set()
+        self._server = None
+        self._executor = None
+        self._batcher = None
+        self._slots = None
+
+        self._counters = {
+            "requests": 0, "validated": 0, "coalesced": 0, "rejected": 0, "batches": 0,
+            "errors": 0,
+        }
+        self._latency = LatencyHistogram()
+        self._batch_latency = LatencyHistogram()
+
+    @property
+    def port(self):
+        """
+        This method returns the bound port, or the requested one before the server has started.
+        """
+        if self._server is not None:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self):
+        """
+        This method starts the worker pool and the batcher, and begins accepting connections.
+
+        The workers are started by a fork server, or spawned where there is none, rather than
+        forked from this process. A forked worker would inherit the listening socket and every
+        client connection open at the time, and a client whose connection a worker still held
+        would never see it close. The workers are also started here, before the server listens,
+        so that the first requests do not wait for them.
+        """
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._workers, mp_context=context, initializer=_ignore_interrupt,
+        )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, os.getpid) for _ in range(self._workers))
+        )
+
+        self._slots = asyncio.Semaphore(2 * self._workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+
+    async def serve_forever(self):
+        """
+        This method accepts connections until it is cancelled.
+        """
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        This method stops accepting connections, cancels the batcher and shuts down the pool.
+
+        Requests still waiting for a result are answered with status 503.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+        for future in self._inflight.values():
+            if not future.done():
+                future.set_exception(_HTTPError(503, "Error: Server is shutting down."))
+        self._inflight.clear()
+        if self._executor is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, partial(self._executor.shutdown, wait=True, cancel_futures=True)
+            )
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def metrics(self):
+        """
+        This method returns the counters and latency histograms of the service.
+
+        Returns
+        ----------
+        dict
+            The counters "requests" (to /validate), "validated" (grids sent to the workers),
+            "coalesced" (requests that shared the result of an identical one), "rejected"
+            (requests answered with 503), "batches" and "errors", the number of grids "pending"
+            in the queue, and the histograms "latency" of /validate requests and "batch_latency"
+            of batches in the workers.
+        """
+        return {
+            **self._counters,
+            "pending": self._queue.qsize(),
+            "workers": self._workers,
+            "latency": self._latency.snapshot(),
+            "batch_latency": self._batch_latency.snapshot(),
+        }
+
+    async def _validate(self, key):
+        """
+        Return the (valid, error) result for a key, sharing it with identical waiting requests.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((key, future))
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            raise _HTTPError(503, "Error: Too many pending requests, try again later.") from None
+        self._inflight[key] = future
+        return await asyncio.shield(future)
+
+    async def _batch_loop(self):
+        """
+        Gather queued requests into batches and start a task for each batch.
+
+        A batch is only gathered once a worker slot is free, so requests that arrive while the
+        workers are busy join the next batch instead of waiting in a batch of their own.
+        """
+        queue = self._queue
+        while True:
+            await self._slots.acquire()
+            batch = [await queue.get()]
+            while len(batch) < self._batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            if len(batch) < self._batch_size and self._batch_delay > 0:
+                await asyncio.sleep(self._batch_delay)
+                while len(batch) < self._batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        """
+        Validate a batch in the worker pool and hand each result to its waiting requests.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            groups = {}
+            for key, future in batch:
+                groups.setdefault(key[0], []).append((key, future))
+
+            calls = [
+                loop.run_in_executor(
+                    self._executor, _validate_chunk, CLASSES[name], 0,
+                    [(n, occupancies) for (_, n, occupancies), _ in group],
+                )
+                for name, group in groups.items()
+            ]
+            results = await asyncio.gather(*calls, return_exceptions=True)
+
+            for group, outcome in zip(groups.values(), results):
+                if isinstance(outcome, BaseException):
+                    outcome = [outcome] * len(group)
+                for (key, future), result in zip(group, outcome):
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    if future.done():
+                        continue
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        _, valid, error = result
+                        future.set_result((valid, error))
+        finally:
+            self._slots.release()
+            self._counters["batches"] += 1
+            self._counters["validated"] += len(batch)
+            self._batch_latency.observe(time.perf_counter() - start)
+
+    async def _read_request(self, reader):
+        """
+        Return the (method, path, headers, body) of the next request, or None at end of stream.
+
+        Raises
+        ---------
+        _HTTPError
+            If the request is malformed or its body is larger than max_body.
+        """
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, path, version = line.decode("latin-1").split()
+        except ValueError:
+            raise _HTTPError(400, "Error: Malformed request line.") from None
+
+        headers = {"version": version}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise _HTTPError(400, "Error: Malformed Content-Length.") from None
+        if length > self._max_body:
+            raise _HTTPError(413, "Error: Request body is too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method, path, body):
+        """
+        Return the (status, payload) answer to a request.
+        """
+        if path == "/validate":
+            if method != "POST":
+                raise _HTTPError(405, "Error: Use POST for /validate.")
+            start = time.perf_counter()
+            self._counters["requests"] += 1
+            try:
+                valid, error = await self._validate(_parse(body))
+            finally:
+                self._latency.observe(time.perf_counter() - start)
+            return 200, {"valid": valid, "error": error}
+
+        if method != "GET":
+            raise _HTTPError(405, f"Error: Use GET for {path}.")
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path == "/health":
+            return 200, {"status": "ok"}
+        raise _HTTPError(404, f"Error: No endpoint {path}.")
+
+    @staticmethod
+    def _write(writer, status, payload, keep_alive, extra_headers=()):
+        """
+        Write a JSON response.
+        """
+        body = json.dumps(payload).encode()
+        head = [
+            f"HTTP/1.1 {status} {_REASONS[status]}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            *extra_headers,
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def _handle(self, reader, writer):
+        """
+        Answer the requests of one connection, keeping it open between requests unless asked not to.
+        """
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection == "keep-alive" or (
+                        headers["version"] == "HTTP/1.1" and connection != "close"
+                    )
+                    status, payload = await self._dispatch(method, path, body)
+                    self._write(writer, status, payload, keep_alive)
+                except _HTTPError as e:
+                    extra = ("Retry-After: 1",) if e.status == 503 else ()
+                    self._write(writer, e.status, {"error": str(e)}, keep_alive, extra)
+                except Exception as e:
+                    self._counters["errors"] += 1
+                    self._write(writer, 500, {"error": f"{type(e).__name__}: {e}"}, False)
+                    keep_alive = False
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        except asyncio.CancelledError:
+            # Connections still open when the event loop shuts down are cancelled. Nothing awaits
+            # this task, so the cancellation ends it quietly instead of being logged as an error.
+            pass
+        finally:
+            writer.close()
+
+async def _serve(args):
+    """
+    Run a ValidationServer with the command line arguments until cancelled.
+    """
+    async with ValidationServer(
+        args.host, args.port, args.workers, args.batch_size, args.batch_delay, args.max_pending,
+    ) as server:
+        print(f"Serving on http://{args.host}:{server.port} with {server._workers} worker(s)")
+        await server.serve_forever()
+
+def main(argv=None):
+    """
+    Run the validation service from the command line until interrupted, and return the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m until.server", description="Serve grid validation over HTTP.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to bind (default 8765)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=256, help="largest batch of grids")
+    parser.add_argument(
+        "--batch-delay", type=float, default=0.002,
+        help="seconds to wait to fill a batch (default 0.002)",
+    )
+    parser.add_argument(
+        "--max-pending", type=int, default=4096,
+        help="grids allowed to wait before requests are refused with 503 (default 4096)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Sparse variants of the grid classes for the until package, for very large side lengths.
+
+The bitboard that a Grid builds for its transforms, comparisons and addition has a bit for every
+cell, so it takes n^2 / 8 bytes whatever the number of occupancies, which is 1.25 GB at
+n = 100,000 even though a uniform grid of that size has only 200,000 occupied cells. A sparse grid
+keeps the same occupancy array of flat indices, never builds the bitboard for these operations,
+and also stores, for each row and each column holding an occupancy, the set of its occupied
+columns or rows. Its memory is therefore O(k) for k occupancies, and the uniformity check
+of SparseUniformGrid and SparseUNTiL counts the cells of each row and column in O(n + k) time and
+memory.
+
+The sparse classes behave exactly as their dense counterparts, since the grid classes read and
+change their cells only through the storage methods that a sparse grid overrides. Grids of either
+kind can be compared and added together. The results of copy(), the transforms, canonical() and
+addition are SparseGrid instances, as those of a Grid are Grid instances.
+
+Rows are built on demand by get_row, and drawing a grid with more than MAX_DRAW rows through str()
+raises an OperatorError, since the drawing has n^2 cells. lines() yields the drawing one row at a
+time instead.
+
+Classes
+----------
+SparseGrid
+    Grid stored as per-row and per-column occupancy sets.
+
+SparseUniformGrid
+    Sparse UniformGrid.
+
+SparseNTiL
+    Sparse NTiL.
+
+SparseUNTiL
+    Sparse UNTiL.
+"""
+
+from .grids import Grid, UniformGrid, NTiL, UNTiL, D4, _transform, _canonical_key, _bitboard
+from .exceptions import OccupancyError, OperatorError
+
+def _indices(grid):
+    """
+    Return the set of flat indices row * n + col of the occupied cells of a grid or view.
+    """
+    if isinstance(grid, Grid):
+        return set(grid._occupancies)
+    n = grid._n
+    return {row * n + col for row, col in grid.occupancies}
+
+class SparseGrid(Grid):
+    """
+    Represent an n x n occupancy grid by the sets of occupied cells of its rows and columns.
+
+    Parameters
+    -------------
+    n: int
+        Side length of the grid.
+
+    occupancies: list[tuple[int, int]]
+        Coordinates of the occupied cells given as (row, column) pairs.
+
+    To construct an instance, call the constructor SparseGrid with parameters n and occupancies,
+    for example
+
+    SparseGrid(n=100000, occupancies=[(r1, c1), (r2, c2), ...])
+
+    Methods
+    ----------
+    lines()
+        Yield the rows of the drawing of the grid one at a time.
+
+    __str__()
+        Return a human-readable drawing of the grid, for at most MAX_DRAW rows.
+
+    Notes
+    --------
+    SparseGrid has every method of Grid. The methods returning new grids return SparseGrid
+    instances.
+    """
+
+    __slots__ = ()
+
+    MAX_DRAW = 1000
+
+    def _build(self, occupancies):
+        """
+        This method stores the occupancies of a new grid in the occupancy array and the row and
+        column sets.
+
+        Attributes
+        -------------
+            _rows: dict[int, set[int]]
+                Map from each row holding an occupancy to its occupied columns.
+
+            _cols: dict[int, set[int]]
+                Map from each column holding an occupancy to its occupied rows.
+
+        Raises
+        ---------
+        IndexError
+            If any coordinate lies outside the grid.
+        """
+        n = self._n
+        rows = {}
+        cols = {}
+        for row, col in occupancies:
+            if not (0 <= row < n and 0 <= col < n):
+                raise IndexError('Grid coordinates out of range.')
+            rows.setdefault(row, set()).add(col)
+            cols.setdefault(col, set()).add(row)
+            self._append(row * n + col)
+        self._rows = rows
+        self._cols = cols
+
+    @property
+    def _bits(self):
+        """
+        This method returns the bitboard of the grid, built from the occupancy array.
+
+        The bitboard takes n^2 / 8 bytes, so it is only built when the grid is combined with a
+        dense grid, which already has a bitboard of that size.
+        """
+        return _bitboard(self._occupancies, self._n)
+
+    def _has(self, coords):
+        """
+        This method tests whether the cell at coords is occupied.
+
+        Raises
+        ---------
+        IndexError
+            If the coordinate lies outside the grid.
+        """
+        row, col = coords
+        if not (0 <= row < self._n and 0 <= col < self._n):
+            raise IndexError('Grid coordinates out of range.')
+        cells = self._rows.get(row)
+        return cells is not None and col in cells
+
+    def _insert(self, coords):
+        """
+        This method occupies the cell at coords, which must be vacant.
+        """
+        row, col = coords
+        self._rows.setdefault(row, set()).add(col)
+        self._cols.setdefault(col, set()).add(row)
+        self._append(row * self._n + col)
+
+    def _discard(self, coords):
+        """
+        This method vacates the cell at coords, which must be occupied.
+
+        Rows and columns left empty are dropped, so the memory of the grid stays O(k).
+        """
+        row, col = coords
+        for cells, key, value in ((self._rows, row, col), (self._cols, col, row)):
+            cells[key].discard(value)
+            if not cells[key]:
+                del cells[key]
+        self._remove(row * self._n + col)
+
+    def _commute(self, coords1, coords2):
+        """
+        This method moves the occupancies at coords1 and coords2 to the opposite corners of their
+        rectangle, after checking that the move is possible.
+
+        Raises
+        ---------
+        OccupancyError
+            If either input coordinate is vacant, or either target coordinate is occupied.
+        """
+        new1 = (coords1[0], coords2[1])
+        new2 = (coords2[0], coords1[1])
+
+        if not self._has(coords1) or not self._has(coords2):
+            raise OccupancyError('Both input coordinates must be occupied.')
+
+        if self._has(new1) or self._has(new2):
+            raise OccupancyError('Both target coordinates must be vacant.')
+
+        self._discard(coords1)
+        self._discard(coords2)
+        self._insert(new1)
+        self._insert(new2)
+
+    def get_row(self, i):
+        """
+        This method returns a copy of row i of the grid, built from the occupied columns of the row.
+        """
+        i = range(self._n)[i]
+        row = [False] * self._n
+        for col in self._rows.get(i, ()):
+            row[col] = True
+        return row
+
+    def lines(self):
+        """
+        This method yields the rows of the drawing of the grid, as drawn by __str__, one at a time.
+        """
+        vacant = "□"
+        occupied = "■"
+        for i in range(self._n):
+            yield " ".join(occupied if cell else vacant for cell in self.get_row(i))
+
+    def __str__(self):
+        """
+        This method returns a human readable drawing of the grid.
+
+        Raises
+        ---------
+        OperatorError
+            If the grid has more than MAX_DRAW rows, since the drawing would have n^2 cells.
+            lines() yields the drawing one row at a time instead.
+        """
+        if self._n > self.MAX_DRAW:
+            raise OperatorError(
+                f'Grid too large to draw (n > {self.MAX_DRAW}); iterate over lines() instead.'
+            )
+        return "\n".join(self.lines())
+
+    def copy(self):
+        """
+        This method returns a new SparseGrid with the same size and occupancies.
+        """
+        return SparseGrid(self._n, self.occupancies)
+
+    def _transformed(self, name):
+        """
+        This method returns a new SparseGrid holding the image of the grid under a symmetry of D4.
+        """
+        n = self._n
+        transform = D4[name]
+        occupancies = sorted(_transform(n, coords, transform) for coords in self.occupancies)
+        return SparseGrid(n, occupancies)
+
+    def v_reflected(self):
+        """
+        This method returns the vertical reflection of the grid.
+        """
+        return self._transformed("v_reflected")
+
+    def h_reflected(self):
+        """
+        This method returns the horizontal reflection of the grid.
+        """
+        return self._transformed("h_reflected")
+
+    def rotated(self):
+        """
+        This method returns the 90 degree clockwise rotation of the grid.
+        """
+        return self._transformed("rotated")
+
+    def canonical(self):
+        """
+        This method returns the canonical image of the grid under the symmetries of the square.
+        """
+        return SparseGrid(self._n, list(_canonical_key(self._n, self.occupancies)))
+
+    def __add__(self, h):
+        """
+        Return the XOR-style sum of two grids of the same size, as a SparseGrid.
+
+        The occupied cells of the result are the symmetric difference of the occupied cells of
+        the two grids, computed in O(k) time.
+
+        Raises
+        ---------
+        OperatorError
+            If the two grids do not have the same side length.
+        """
+        if self._n != h._n:
+            raise OperatorError('Error: Grids must be of matching size.')
+
+        n = self._n
+        indices = set(self._occupancies) ^ _indices(h)
+        return SparseGrid(n, [divmod(index, n) for index in sorted(indices)])
+
+    def __eq__(self, h):
+        """
+        This method checks whether two grids are equal.
+
+        Returns
+        ----------
+        bool: None
+            True if the grids have the same size and the same occupied coordinates, False if the
+            sizes match but the occupancies differ, and None, after printing an error message,
+            if the grid sizes do not match.
+        """
+        if self._n != h._n:
+            print('Error: Grids must be of matching size.')
+            return None
+
+        return set(self._occupancies) == _indices(h)
+
+    def __le__(self, h):
+        """
+        This method checks whether the occupancies of this grid are a subset of h.
+
+        Returns
+        ----------
+        bool: None
+            True if every occupied cell in this grid is also occupied in h, False if not, and
+            None, after printing an error message, if the grid sizes do not match.
+        """
+        if self._n != h._n:
+            print('Error: Grids must be of matching size.')
+            return None
+
+        return set(self._occupancies) <= _indices(h)
+
+    def __ge__(self, h):
+        """
+        This method checks whether the occupancies of this grid are a superset of h.
+
+        Returns
+        ----------
+        bool: None
+            True if every occupied cell in h is also occupied in this grid, False if not, and
+            None, after printing an error message, if the grid sizes do not match.
+        """
+        if self._n != h._n:
+            print('Error: Grids must be of matching size.')
+            return None
+
+        return set(self._occupancies) >= _indices(h)
+
+class SparseUniformGrid(SparseGrid, UniformGrid):
+    """
+    Represent a uniform grid with sparse storage.
+
+    Uniformity is checked on creation by counting the cells of each row and column, in O(n + k)
+    time, and SparseUniformGrid.random builds a random uniform grid of any size in O(n) memory.
+    """
+
+    __slots__ = ()
+
+class SparseNTiL(SparseGrid, NTiL):
+    """
+    Represent a No Three in Line grid with sparse storage.
+
+    The NTiL condition is checked on creation by NTiL, from the occupancies alone.
+    """
+
+    __slots__ = ()
+
+class SparseUNTiL(SparseUniformGrid, UNTiL):
+    """
+    Represent a grid satisfying both uniformity and NTiL, with sparse storage.
+
+    Both conditions are checked on creation by UNTiL.
+    """
+
+    __slots__ = ()
@@ -0,0 +1,216 @@
+"""
+On-disk corpus of verified sample grids for the until test subpackage.
+
+The samples in samples.py stop at n = 13. This module generates larger samples, verifies each one
+with the validating constructor of its class, and caches them in the binary format of until.io,
+one file per kind and side length, under a data directory versioned by CORPUS_VERSION. Bumping
+the version whenever the generators change keeps stale files from being mixed with new ones.
+
+Two kinds of grid are kept:
+
+    uniform
+        Random uniform grids from UniformGrid.random, for any n.
+
+    until
+        UNTiL grids from until.search.find_until. These are only found quickly for n up to
+        about 20, since no fast construction of large UNTiL grids is known, so each search is
+        given a time limit and side lengths for which it runs out are skipped.
+
+Build the corpus with
+
+    python -m until.tests.corpus --kind uniform --n 16 32 64 128 256 512
+    python -m until.tests.corpus --kind until --n 14 16 18 20 --time-limit 60
+
+The data directory is until/tests/data/v<CORPUS_VERSION>, or $UNTIL_DATA_DIR/v<CORPUS_VERSION> if
+that environment variable is set, and is not tracked by git.
+
+Functions
+-----------
+build(kind, n_values, count=1, seed=0, time_limit=60.0)
+    Generate, verify and save grids.
+
+available(kind)
+    Return the side lengths saved for a kind.
+
+load(kind, n)
+    Open the saved grids of a kind and side length.
+
+first_occupancies(kind)
+    Return the occupancies of the first saved grid for each side length.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from ..grids import UniformGrid, UNTiL
+from ..io import CorpusReader, CorpusWriter, FLAG_UNTIL
+from ..search import find_until
+
+CORPUS_VERSION = 1
+
+KINDS = ("uniform", "until")
+
+def data_dir():
+    """
+    Return the versioned directory holding the corpus files.
+    """
+    root = os.environ.get("UNTIL_DATA_DIR")
+    root = Path(root) if root else Path(__file__).resolve().parent / "data"
+    return root / f"v{CORPUS_VERSION}"
+
+def _path(kind, n):
+    """
+    Return the path of the corpus file of a kind and side length.
+
+    Raises
+    ---------
+    ValueError
+        If kind is not one of KINDS.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}.")
+    return data_dir() / f"{kind}_n{n}.untl"
+
+def _generate(kind, n, count, seed, time_limit):
+    """
+    Return up to count distinct verified occupancy lists of a kind and side length.
+    """
+    found = []
+    seen = set()
+    for attempt in range(count * 4):
+        if len(found) == count:
+            break
+
+        if kind == "uniform":
+            grid = UniformGrid.random(n, seed=seed + attempt)
+            UniformGrid(n, grid.occupancies)
+        else:
+            grid = find_until(n, time_limit=time_limit, seed=seed + attempt)
+            if grid is None:
+                break
+            UNTiL(n, grid.occupancies)
+
+        key = frozenset(grid.occupancies)
+        if key not in seen:
+            seen.add(key)
+            found.append(grid.occupancies)
+    return found
+
+def build(kind, n_values, count=1, seed=0, time_limit=60.0):
+    """
+    Generate, verify and save grids of a kind for each side length.
+
+    Parameters
+    -------------
+    kind: str
+        "uniform" or "until".
+
+    n_values: iterable[int]
+        Side lengths to generate.
+
+    count: int
+        Number of distinct grids to keep per side length, by default 1.
+
+    seed: int
+        Seed of the first attempt, by default 0. Later attempts use the following seeds.
+
+    time_limit: float or None
+        Seconds allowed for each UNTiL search, by default 60.
+
+    Returns
+    ----------
+    dict[int, int]
+        Map from each side length to the number of grids saved. Side lengths for which no grid
+        was found are left out, and no file is written for them.
+
+    Raises
+    ---------
+    OccupancyError
+        If a generated grid fails verification, which would indicate a bug in a generator.
+    """
+    directory = data_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    flags = FLAG_UNTIL if kind == "until" else 0
+    saved = {}
+
+    for n in n_values:
+        grids = _generate(kind, n, count, seed, time_limit)
+        if not grids:
+            continue
+
+        path = _path(kind, n)
+        temporary = path.with_suffix(".tmp")
+        with CorpusWriter(temporary, n, flags) as writer:
+            for occupancies in grids:
+                writer.write(occupancies)
+        temporary.replace(path)
+        saved[n] = len(grids)
+
+    return saved
+
+def available(kind):
+    """
+    Return the sorted side lengths for which grids of a kind are saved.
+    """
+    prefix = f"{kind}_n"
+    directory = data_dir()
+    if not directory.is_dir():
+        return []
+    return sorted(
+        int(path.stem[len(prefix):]) for path in directory.glob(f"{prefix}*.untl")
+    )
+
+def load(kind, n):
+    """
+    Open the saved grids of a kind and side length.
+
+    Returns
+    ----------
+    CorpusReader
+        Reader yielding UniformGrid or UNTiL instances. The grids were verified when they were
+        saved, so the reader builds them with from_trusted.
+
+    Raises
+    ---------
+    FileNotFoundError
+        If no grids of that kind and side length are saved.
+    """
+    return CorpusReader(_path(kind, n), trusted=True)
+
+def first_occupancies(kind):
+    """
+    Return the occupancies of the first saved grid of a kind for each side length, in order of n.
+    """
+    result = []
+    for n in available(kind):
+        with load(kind, n) as corpus:
+            if len(corpus):
+                result.append(corpus.occupancies(0))
+    return result
+
+def main(argv=None):
+    """
+    Build corpus files from the command line and return the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m until.tests.corpus", description="Build the on-disk sample corpus.",
+    )
+    parser.add_argument("--kind", choices=KINDS, required=True, help="kind of grid to generate")
+    parser.add_argument("--n", type=int, nargs="+", required=True, help="side lengths")
+    parser.add_argument("--count", type=int, default=1, help="grids per side length")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first attempt")
+    parser.add_argument(
+        "--time-limit", type=float, default=60.0, help="seconds per UNTiL search (default 60)",
+    )
+    args = parser.parse_args(argv)
+
+    saved = build(args.kind, args.n, args.count, args.seed, args.time_limit)
+    for n in args.n:
+        print(f"{args.kind} n={n}: {saved.get(n, 0)} grid(s) saved")
+    print(f"Corpus directory: {data_dir()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
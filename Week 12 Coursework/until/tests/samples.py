@@ -10,6 +10,18 @@ until_occupancies: list
     List of occupancy lists, where each occupancy list is 
     a list of tuples of length two.  These are intended to be
     given as arguments to the Grid class and its subclasses.
+
+corpus_until_occupancies: list
+    Occupancy lists of the UNTiL grids saved in the on-disk corpus,
+    one per side length, in order of n.
+
+corpus_uniform_occupancies: list
+    Occupancy lists of the uniform grids saved in the on-disk corpus,
+    one per side length, in order of n.
+
+The two corpus values are read from the files written by corpus.py
+the first time they are accessed, so importing this module stays
+instant. They are empty lists if the corpus has not been built.
 """
 
 until_occupancies = [
@@ -23,4 +35,22 @@ until_occupancies = [
     [(0, 3), (0, 10), (1, 2), (1, 5), (2, 4), (2, 8), (3, 5), (3, 8), (4, 9), (4, 10), (5, 0), (5, 3), (6, 1), (6, 9), (7, 0), (7, 7), (8, 1), (8, 4), (9, 6), (9, 7), (10, 2), (10, 6)],
     [(0, 0), (0, 6), (1, 10), (1, 6), (2, 1), (2, 5), (3, 8), (3, 10), (4, 5), (4, 8), (5, 3), (5, 11), (6, 0), (6, 2), (7, 3), (7, 9), (8, 7), (8, 11), (9, 1), (9, 4), (10, 2), (10, 7), (11, 4), (11, 9)],
     [(0, 4), (0, 8), (1, 3), (1, 9), (2, 0), (2, 6), (3, 10), (3, 12), (4, 5), (4, 9), (5, 2), (5, 12), (6, 1), (6, 11), (7, 2), (7, 4), (8, 8), (8, 11), (9, 5), (9, 7), (10, 1), (10, 10), (11, 3), (11, 7), (12, 0), (12, 6)]
-]
\ No newline at end of file
+]
+
+_corpus_kinds = {
+    "corpus_until_occupancies": "until",
+    "corpus_uniform_occupancies": "uniform",
+}
+
+def __getattr__(name):
+    """
+    Load the corpus values on first access and cache them as module attributes.
+    """
+    if name not in _corpus_kinds:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from .corpus import first_occupancies
+
+    value = first_occupancies(_corpus_kinds[name])
+    globals()[name] = value
+    return value
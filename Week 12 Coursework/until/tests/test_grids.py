@@ -0,0 +1,508 @@
+"""
+Regression tests for the grid classes of the until package.
+
+Run them with python -m unittest until.tests.test_grids, or with pytest. Each test class covers
+one feature, and compares its fast path with a direct or brute-force computation, on random
+point sets and on the sample grids of samples.py.
+"""
+
+import os
+import random
+import tempfile
+import unittest
+from ast import literal_eval
+from importlib.util import find_spec
+from itertools import combinations
+
+from .samples import until_occupancies
+from ..grids import Grid, UniformGrid, NTiL, UNTiL, D4, til, _line, _transform
+from ..search import enumerate_until, enumerate_until_parallel
+from ..io import CorpusWriter, CorpusReader, FLAG_UNTIL, write_corpus
+from ..views import GridView
+from ..sparse import SparseGrid, SparseUniformGrid, SparseNTiL, SparseUNTiL
+from ..exceptions import OccupancyError
+
+# The cell maps of the original, matrix-based Grid.v_reflected, h_reflected and rotated.
+BASELINE = {
+    "v_reflected": lambda n, r, c: (n - 1 - r, c),
+    "h_reflected": lambda n, r, c: (r, n - 1 - c),
+    "rotated": lambda n, r, c: (c, n - 1 - r),
+}
+
+# Numbers of UNTiL grids of side length n = 2, ..., 8, from OEIS A000755.
+UNTIL_TOTALS = {2: 1, 3: 2, 4: 11, 5: 32, 6: 50, 7: 132, 8: 380}
+
+# Numbers of UNTiL grids up to the symmetries of the square, from OEIS A000769.
+UNTIL_CLASSES = {2: 1, 3: 1, 4: 4, 5: 5, 6: 11, 7: 22, 8: 57}
+
+def _random_points(rng, n, k):
+    """
+    Return k distinct random cells of an n x n grid.
+    """
+    return [divmod(index, n) for index in rng.sample(range(n * n), k)]
+
+def _has_til(occupancies):
+    """
+    Return whether any three of the occupancies lie in a straight line, by testing every triple.
+    """
+    return any(til(*triple) for triple in combinations(occupancies, 3))
+
+def _brute_lines(occupancies):
+    """
+    Return the line index of a set of occupancies, with each pair stored as a set.
+    """
+    return {_line(pt1, pt2): {pt1, pt2} for pt1, pt2 in combinations(occupancies, 2)}
+
+def _index(grid):
+    """
+    Return the line index of a grid, with each pair stored as a set.
+    """
+    return {line: set(pair) for line, pair in grid._lines.items()}
+
+def _brute_commutators(n, occupancies):
+    """
+    Return the legal commutator moves of an UNTiL grid, found by rebuilding it after each move.
+    """
+    moves = set()
+    for pt1, pt2 in combinations(occupancies, 2):
+        targets = [(pt1[0], pt2[1]), (pt2[0], pt1[1])]
+        if any(target in occupancies for target in targets):
+            continue
+        moved = [pt for pt in occupancies if pt != pt1 and pt != pt2] + targets
+        try:
+            UNTiL(n, moved)
+        except (OccupancyError, IndexError):
+            continue
+        moves.add((pt1, pt2))
+    return moves
+
+class TestLineIndex(unittest.TestCase):
+    """
+    Check that the line index of an UNTiL grid matches the index built from its occupancies.
+    """
+
+    def test_built_on_request(self):
+        for occupancies in until_occupancies:
+            n = len(occupancies) // 2
+            self.assertIsNone(UNTiL(n, occupancies)._lines)
+            grid = UNTiL(n, occupancies, line_index=True)
+            self.assertEqual(_index(grid), _brute_lines(occupancies))
+
+    def test_commutator_keeps_index(self):
+        rng = random.Random(0)
+        for occupancies in until_occupancies:
+            n = len(occupancies) // 2
+            grid = UNTiL(n, occupancies, line_index=True)
+            for _ in range(20):
+                moves = list(grid.legal_commutators())
+                if not moves:
+                    break
+                grid.commutator(*rng.choice(moves))
+                self.assertEqual(_index(grid), _brute_lines(grid.occupancies))
+
+    def test_legal_commutators(self):
+        rng = random.Random(1)
+        for occupancies in until_occupancies:
+            n = len(occupancies) // 2
+            grid = UNTiL(n, occupancies, line_index=True)
+            for _ in range(5):
+                expected = _brute_commutators(n, grid.occupancies)
+                self.assertEqual(set(grid.legal_commutators()), expected)
+                self.assertEqual(set(UNTiL(n, grid.occupancies).legal_commutators()), expected)
+                if not expected:
+                    break
+                grid.commutator(*rng.choice(sorted(expected)))
+
+class TestSwapRemove(unittest.TestCase):
+    """
+    Check that removals move the last occupancy into the vacated position, that cell look-ups
+    and the bitboard follow every change, and that repr() still round-trips.
+    """
+
+    def test_order_after_deletions(self):
+        rng = random.Random(2)
+        for n in (3, 7, 20):
+            expected = _random_points(rng, n, n * n // 2)
+            grid = Grid(n, expected)
+            while expected:
+                coords = rng.choice(expected)
+                grid.del_occupancy(coords)
+                position = expected.index(coords)
+                expected[position] = expected[-1]
+                expected.pop()
+                self.assertEqual(grid.occupancies, expected)
+                self.assertFalse(grid._has(coords))
+                self.assertTrue(all(grid._has(pt) for pt in expected))
+
+                if rng.random() < 0.3:
+                    vacant = rng.choice([
+                        (r, c) for r in range(n) for c in range(n) if (r, c) not in expected
+                    ])
+                    grid.add_occupancy(vacant)
+                    expected.append(vacant)
+                    self.assertEqual(grid.occupancies, expected)
+
+                copy = eval(repr(grid), {"Grid": Grid})
+                self.assertEqual(copy.occupancies, expected)
+                self.assertTrue(copy == grid)
+                self.assertTrue(grid <= Grid(n, expected) and grid >= Grid(n, expected))
+
+    def test_commutator_updates_cells(self):
+        rng = random.Random(6)
+        for n in (4, 9, 16):
+            grid = UniformGrid.random(n, rng)
+            for _ in range(100):
+                pt1, pt2 = rng.sample(grid.occupancies, 2)
+                new1, new2 = (pt1[0], pt2[1]), (pt2[0], pt1[1])
+                if pt1[0] == pt2[0] or pt1[1] == pt2[1] or grid._has(new1) or grid._has(new2):
+                    with self.assertRaises(OccupancyError):
+                        grid.commutator(pt1, pt2)
+                    continue
+
+                self.assertTrue(grid == Grid(n, grid.occupancies))
+                grid.commutator(pt1, pt2)
+                self.assertFalse(grid._has(pt1) or grid._has(pt2))
+                self.assertTrue(grid._has(new1) and grid._has(new2))
+                self.assertTrue(grid == Grid(n, grid.occupancies))
+
+class TestNTiLValidation(unittest.TestCase):
+    """
+    Check NTiL validation against the brute-force test of every triple with til.
+    """
+
+    def test_validation(self):
+        rng = random.Random(3)
+        for _ in range(300):
+            n = rng.randint(3, 8)
+            occupancies = _random_points(rng, n, rng.randint(3, 2 * n))
+            try:
+                NTiL(n, occupancies)
+            except OccupancyError as e:
+                self.assertTrue(_has_til(occupancies))
+                triple = literal_eval(str(e).split(': ', 1)[1].rstrip('.'))
+                self.assertTrue(til(*triple))
+                self.assertTrue(all(pt in occupancies for pt in triple))
+            else:
+                self.assertFalse(_has_til(occupancies))
+
+class TestNTiLAddOccupancy(unittest.TestCase):
+    """
+    Check NTiL.add_occupancy and del_occupancy, with and without the line index, against til.
+    """
+
+    def test_add_and_del_occupancy(self):
+        rng = random.Random(4)
+        for line_index in (False, True):
+            for _ in range(30):
+                n = rng.randint(4, 10)
+                grid = NTiL(n, [], line_index=line_index)
+                for coords in _random_points(rng, n, n * n):
+                    current = grid.occupancies
+                    if not _has_til(current + [coords]):
+                        grid.add_occupancy(coords)
+                        current.append(coords)
+                    else:
+                        with self.assertRaises(OccupancyError):
+                            grid.add_occupancy(coords)
+                    self.assertEqual(grid.occupancies, current)
+
+                    if current and rng.random() < 0.2:
+                        grid.del_occupancy(rng.choice(current))
+                    if line_index:
+                        self.assertEqual(_index(grid), _brute_lines(grid.occupancies))
+
+class TestEnumerator(unittest.TestCase):
+    """
+    Check enumerate_until against the published numbers of UNTiL grids.
+    """
+
+    def test_totals(self):
+        for n, total in UNTIL_TOTALS.items():
+            grids = list(enumerate_until(n, as_grids=False))
+            found = {frozenset(occupancies) for occupancies in grids}
+            self.assertEqual(len(grids), total)
+            self.assertEqual(len(found), total)
+            if n <= 6:
+                for occupancies in found:
+                    UNTiL(n, list(occupancies))
+
+    def test_limit(self):
+        self.assertEqual(len(list(enumerate_until(8, limit=5))), 5)
+
+class TestCanonical(unittest.TestCase):
+    """
+    Check canonical forms, stabilisers and the enumeration of symmetry classes.
+    """
+
+    def test_canonical_is_invariant(self):
+        rng = random.Random(7)
+        grids = [UNTiL(len(occupancies) // 2, occupancies) for occupancies in until_occupancies]
+        grids += [Grid(6, _random_points(rng, 6, rng.randint(0, 20))) for _ in range(50)]
+        for grid in grids:
+            n = grid._n
+            canonical = grid.canonical()
+            images = {
+                name: Grid(n, [_transform(n, pt, transform) for pt in grid.occupancies])
+                for name, transform in D4.items()
+            }
+            for image in images.values():
+                self.assertTrue(image.canonical() == canonical)
+            smallest = min(sorted(image.occupancies) for image in images.values())
+            self.assertEqual(canonical.occupancies, smallest)
+            self.assertEqual(
+                set(grid.symmetry_group()),
+                {name for name, image in images.items() if image == grid},
+            )
+
+    def test_classes(self):
+        for n, classes in UNTIL_CLASSES.items():
+            grids = list(enumerate_until(n, up_to_symmetry=True))
+            self.assertEqual(len(grids), classes)
+            self.assertEqual(len({tuple(grid.canonical().occupancies) for grid in grids}), classes)
+            # By the orbit-stabiliser theorem, the orbits of the classes cover every grid once.
+            orbits = sum(len(D4) // len(grid.symmetry_group()) for grid in grids)
+            self.assertEqual(orbits, UNTIL_TOTALS[n])
+
+class TestParallelSearch(unittest.TestCase):
+    """
+    Check that the parallel enumerator yields the same grids as the serial one.
+    """
+
+    def test_matches_serial(self):
+        for n in range(2, 8):
+            for symmetry in (None, "rotation_180", "rotation_90"):
+                serial = {
+                    frozenset(occupancies)
+                    for occupancies in enumerate_until(n, as_grids=False, symmetry=symmetry)
+                }
+                for prefix_rows in (1, 2):
+                    parallel = list(enumerate_until_parallel(
+                        n, workers=2, prefix_rows=prefix_rows, as_grids=False, symmetry=symmetry,
+                    ))
+                    self.assertEqual(len(parallel), len(serial))
+                    self.assertEqual({frozenset(occupancies) for occupancies in parallel}, serial)
+
+    def test_up_to_symmetry_and_limit(self):
+        grids = list(enumerate_until_parallel(7, workers=2, up_to_symmetry=True))
+        self.assertEqual(len(grids), UNTIL_CLASSES[7])
+        self.assertEqual(len(list(enumerate_until_parallel(7, workers=2, limit=3))), 3)
+
+@unittest.skipIf(find_spec("numpy") is None, "until.batch needs NumPy")
+class TestNTiLMask(unittest.TestCase):
+    """
+    Check the vectorised NTiL test of until.batch against NTiL, for several memory limits.
+    """
+
+    def test_matches_ntil(self):
+        from ..batch import GridBatch, ntil_mask
+
+        rng = random.Random(8)
+        for n in (3, 5, 8):
+            for equal_lengths in (True, False):
+                lists = []
+                for _ in range(200):
+                    k = 2 * n if equal_lengths else rng.randint(0, 2 * n)
+                    lists.append(_random_points(rng, n, k))
+                lists += [occ for occ in until_occupancies if len(occ) == 2 * n]
+
+                expected = []
+                for occupancies in lists:
+                    try:
+                        NTiL(n, occupancies)
+                    except OccupancyError:
+                        expected.append(False)
+                    else:
+                        expected.append(True)
+
+                batch = GridBatch.from_occupancies(n, lists)
+                for max_elements in (1, 7, 1000, 2 ** 22):
+                    mask = ntil_mask(batch, max_elements)
+                    self.assertEqual(mask.tolist(), expected)
+
+class TestCommutator(unittest.TestCase):
+    """
+    Check the incremental NTiL check of UNTiL.commutator against rebuilding the grid.
+    """
+
+    def test_commutator(self):
+        for occupancies in until_occupancies:
+            n = len(occupancies) // 2
+            legal = _brute_commutators(n, occupancies)
+            for pt1, pt2 in combinations(occupancies, 2):
+                targets = [(pt1[0], pt2[1]), (pt2[0], pt1[1])]
+                if any(target in occupancies for target in targets):
+                    continue
+                grid = UNTiL(n, occupancies)
+                if (pt1, pt2) in legal:
+                    grid.commutator(pt1, pt2)
+                    self.assertFalse(_has_til(grid.occupancies))
+                else:
+                    with self.assertRaises(OccupancyError):
+                        grid.commutator(pt1, pt2)
+                    self.assertEqual(grid.occupancies, occupancies)
+
+class TestCorpus(unittest.TestCase):
+    """
+    Check that corpus files round-trip grids, and that invalid records are never written.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "grids.untl")
+
+    def test_round_trip(self):
+        rng = random.Random(9)
+        for n in (2, 7, 40):
+            grids = [UniformGrid.random(n, rng) for _ in range(20)]
+            self.assertEqual(write_corpus(self.path, n, grids), len(grids))
+            with CorpusReader(self.path) as corpus:
+                self.assertEqual((corpus.n, corpus.flags, len(corpus)), (n, 0, len(grids)))
+                for i, grid in enumerate(grids):
+                    self.assertEqual(set(corpus.occupancies(i)), set(grid.occupancies))
+                    self.assertIs(type(corpus[i]), UniformGrid)
+                    self.assertTrue(corpus[i] == grid)
+
+        for occupancies in until_occupancies:
+            n = len(occupancies) // 2
+            with CorpusWriter(self.path, n, FLAG_UNTIL) as writer:
+                writer.write(occupancies)
+                writer.write(UNTiL(n, occupancies).rotated().occupancies)
+            with CorpusReader(self.path, trusted=True) as corpus:
+                grids = list(corpus)
+                self.assertEqual([type(grid) for grid in grids], [UNTiL, UNTiL])
+                self.assertTrue(grids[0] == Grid(n, occupancies))
+                self.assertTrue(grids[1] == Grid(n, occupancies).rotated())
+
+    def test_rejects_invalid_records(self):
+        cases = [
+            [(-1, 0), (-1, 1), (1, 1), (1, 2), (2, 2), (2, 0)],
+            [(0, 0), (0, 3), (1, 1), (1, 2), (2, 2), (2, 0)],
+            [(0, 0), (0, 1), (1, 0), (1, 2), (2, 2), (2, 0)],
+            [(0, 0), (0, 0), (1, 1), (1, 2), (2, 2), (2, 1)],
+            [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 0)],
+        ]
+        collinear = [(0, 0), (0, 1), (1, 1), (1, 2), (2, 2), (2, 0)]
+        with CorpusWriter(self.path, 3, FLAG_UNTIL) as writer:
+            for occupancies in cases + [collinear]:
+                with self.assertRaises((IndexError, OccupancyError)):
+                    writer.write(occupancies)
+            self.assertEqual(writer.count, 0)
+        with CorpusWriter(self.path, 3) as writer:
+            writer.write(collinear)
+        with CorpusReader(self.path) as corpus:
+            self.assertEqual(len(corpus), 1)
+            self.assertEqual(os.path.getsize(self.path), 24 + 2 * 2 * 3)
+
+class TestGridView(unittest.TestCase):
+    """
+    Check that composed GridView symmetries give the grids of the original transforms.
+    """
+
+    def test_composition(self):
+        rng = random.Random(5)
+        for n in (1, 2, 5, 8):
+            base = Grid(n, _random_points(rng, n, rng.randint(0, n * n)))
+            for _ in range(50):
+                names = [rng.choice(list(BASELINE)) for _ in range(rng.randint(0, 6))]
+                view = GridView(base)
+                grid = base
+                cells = set(base.occupancies)
+                for name in names:
+                    view = getattr(view, name)()
+                    grid = getattr(grid, name)()
+                    cells = {BASELINE[name](n, r, c) for r, c in cells}
+
+                self.assertEqual(set(view.occupancies), cells)
+                self.assertTrue(view == grid)
+                rows = [[(r, c) in cells for c in range(n)] for r in range(n)]
+                self.assertEqual([view.get_row(i) for i in range(n)], rows)
+                self.assertEqual([grid.get_row(i) for i in range(n)], rows)
+                self.assertTrue(view.materialize() == grid)
+
+class TestSparse(unittest.TestCase):
+    """
+    Check that the sparse grid classes behave exactly as their dense counterparts.
+    """
+
+    PAIRS = [(Grid, SparseGrid), (UniformGrid, SparseUniformGrid), (NTiL, SparseNTiL),
+             (UNTiL, SparseUNTiL)]
+
+    def test_parity(self):
+        for occupancies in until_occupancies:
+            n = len(occupancies) // 2
+            for dense_class, sparse_class in self.PAIRS:
+                dense = dense_class(n, occupancies)
+                sparse = sparse_class(n, occupancies)
+                self.assertEqual(sparse.occupancies, dense.occupancies)
+                self.assertEqual(str(sparse), str(dense))
+                self.assertEqual(sparse._line_counts(), dense._line_counts())
+                self.assertEqual(
+                    [sparse.get_row(i) for i in range(n)], [dense.get_row(i) for i in range(n)],
+                )
+                for name in ("rotated", "h_reflected", "v_reflected", "canonical"):
+                    image = getattr(sparse, name)()
+                    expected = getattr(dense, name)()
+                    self.assertIsInstance(image, SparseGrid)
+                    self.assertEqual(set(image.occupancies), set(expected.occupancies))
+                self.assertEqual(sparse.symmetry_group(), dense.symmetry_group())
+
+                rotated = dense.rotated()
+                total = set((dense + rotated).occupancies)
+                copy = SparseGrid(n, occupancies)
+                for a, b in ((sparse, dense), (dense, sparse), (sparse, copy)):
+                    self.assertTrue(a == b and a <= b and a >= b)
+                    self.assertEqual(set((a + rotated).occupancies), total)
+                self.assertTrue(GridView(sparse).rotated() == rotated)
+                self.assertTrue(GridView(sparse, "h_reflected") <= dense.h_reflected())
+
+                if dense_class is UNTiL:
+                    moves = list(dense.legal_commutators())
+                    self.assertEqual(list(sparse.legal_commutators()), moves)
+                    if moves:
+                        dense.commutator(*moves[0])
+                        sparse.commutator(*moves[0])
+                        self.assertEqual(sparse.occupancies, dense.occupancies)
+
+    def test_same_errors(self):
+        rng = random.Random(10)
+        for _ in range(200):
+            n = rng.randint(2, 6)
+            occupancies = _random_points(rng, n, rng.randint(0, 2 * n))
+            if rng.random() < 0.1:
+                occupancies.append((n, 0))
+            for dense_class, sparse_class in self.PAIRS:
+                outcomes = []
+                for cls in (dense_class, sparse_class):
+                    try:
+                        cls(n, occupancies)
+                    except (IndexError, OccupancyError) as e:
+                        outcomes.append((type(e), str(e)))
+                    else:
+                        outcomes.append(None)
+                self.assertEqual(outcomes[0], outcomes[1])
+
+    def test_edits(self):
+        rng = random.Random(11)
+        for n in (5, 9):
+            dense = NTiL(n, [])
+            sparse = SparseNTiL(n, [])
+            for coords in _random_points(rng, n, n * n):
+                outcomes = []
+                for grid in (dense, sparse):
+                    try:
+                        grid.add_occupancy(coords)
+                    except OccupancyError:
+                        outcomes.append(False)
+                    else:
+                        outcomes.append(True)
+                self.assertEqual(outcomes[0], outcomes[1])
+                if dense.occupancies and rng.random() < 0.3:
+                    victim = rng.choice(dense.occupancies)
+                    dense.del_occupancy(victim)
+                    sparse.del_occupancy(victim)
+                self.assertEqual(sparse.occupancies, dense.occupancies)
+                self.assertTrue(sparse == dense)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+Batch validation of occupancy lists for the until package.
+
+validate_many checks a stream of candidate (n, occupancies) items against a grid class, such as
+UNTiL, and reports for each item whether the class accepts it. The items are cut into chunks, and
+each chunk is one task for a pool of worker processes, so that the cost of sending items to the
+workers and results back is paid once per chunk rather than once per item. Only a few chunks per
+worker are in flight at any time, so memory stays bounded however long the stream is.
+
+Functions
+-----------
+validate_many(cls, items, workers=None, chunksize=256, ordered=True)
+    Validate many occupancy lists against a grid class.
+
+Constants
+-----------
+CLASSES
+    Map from the name of each grid class to the class, for choosing a class by name.
+
+MAX_DENSE_N
+    Largest side length validated with a class that stores a bitboard.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+from .grids import Grid, UniformGrid, NTiL, UNTiL
+from .sparse import SparseGrid, SparseUniformGrid, SparseNTiL, SparseUNTiL
+from .exceptions import OccupancyError
+
+CLASSES = {
+    "Grid": Grid, "UniformGrid": UniformGrid, "NTiL": NTiL, "UNTiL": UNTiL,
+    "SparseGrid": SparseGrid, "SparseUniformGrid": SparseUniformGrid,
+    "SparseNTiL": SparseNTiL, "SparseUNTiL": SparseUNTiL,
+}
+
+# The bitboard that a dense grid builds for its whole-grid operations takes n^2 / 8 bytes, 50 MB at
+# this side length. Larger items are reported as invalid rather than built, since one huge n could
+# exhaust the memory of a worker.
+MAX_DENSE_N = 20000
+
+def _check(cls, n, occupancies):
+    """
+    Return (True, None) if cls accepts the occupancies, otherwise (False, error message).
+
+    Items that are not well-formed, for example with a coordinate outside the grid, are reported
+    as invalid with the type of the error in the message, as are items with n above MAX_DENSE_N
+    for a class that is not sparse.
+    """
+    if isinstance(n, int) and n > MAX_DENSE_N and not issubclass(cls, SparseGrid):
+        return False, (
+            f"n = {n} is too large for {cls.__name__}, which needs n^2 / 8 bytes; use a sparse "
+            f"class above n = {MAX_DENSE_N}."
+        )
+
+    try:
+        cls(n, occupancies)
+    except OccupancyError as e:
+        return False, str(e)
+    except (IndexError, TypeError, ValueError, MemoryError) as e:
+        return False, f"{type(e).__name__}: {e}"
+    return True, None
+
+def _validate_chunk(cls, start, chunk):
+    """
+    Validate a chunk of items against cls, for use as a worker process task.
+
+    Parameters
+    -------------
+    cls: type
+        Grid class whose conditions the items must satisfy.
+
+    start: int
+        Index of the first item of the chunk in the whole stream.
+
+    chunk: list[tuple[int, list[tuple[int, int]]]]
+        Items (n, occupancies) to validate.
+
+    Returns
+    ----------
+    list[tuple[int, bool, str or None]]
+        For each item, its index, whether it is valid, and the error message if it is not.
+    """
+    return [
+        (index, *_check(cls, n, occupancies))
+        for index, (n, occupancies) in enumerate(chunk, start)
+    ]
+
+def _chunks(items, chunksize):
+    """
+    Yield (start, chunk) pairs cutting items into lists of at most chunksize items.
+    """
+    iterator = iter(items)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+def _run_chunks(function, args, chunks, workers, ordered):
+    """
+    Yield the results of function(*args, start, chunk) for each (start, chunk) of chunks.
+
+    The calls are run in a pool of worker processes, with at most 4 * workers of them submitted
+    at a time, or in this process if workers is 1. function must return a list of results, which
+    are yielded one at a time, in the order of chunks if ordered is True and otherwise as each
+    call finishes. Queued calls are cancelled if the caller stops iterating early.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for start, chunk in chunks:
+            yield from function(*args, start, chunk)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < 4 * workers:
+                task = next(chunks, None)
+                if task is None:
+                    break
+                pending.append(executor.submit(function, *args, *task))
+            if not pending:
+                return
+
+            if ordered:
+                yield from pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def validate_many(cls, items, workers=None, chunksize=256, ordered=True):
+    """
+    Validate many occupancy lists against a grid class, using a pool of worker processes.
+
+    Parameters
+    -------------
+    cls: type
+        Grid class to validate against, for example UNTiL. It must be importable by the worker
+        processes, as every class of the until package is.
+
+    items: iterable[tuple[int, list[tuple[int, int]]]]
+        Items (n, occupancies), read lazily, so a generator of any length may be passed.
+
+    workers: int or None
+        Number of worker processes, by default the number of CPUs. With 1, the items are
+        validated in this process without starting a pool.
+
+    chunksize: int
+        Number of items sent to a worker in one task, by default 256.
+
+    ordered: bool
+        Whether to yield the results in the order of the items, by default True. Otherwise each
+        chunk is yielded as soon as it finishes, which keeps every worker busy even when a slow
+        chunk holds up the one before it.
+
+    Returns
+    ----------
+    iterator[tuple[int, bool, str or None]]
+        Lazy iterator of, for each item, its index in items, whether cls accepts it, and the
+        error message if not.
+
+    Raises
+    ---------
+    ValueError
+        If chunksize is less than 1. validate_many is not itself a generator, so this is raised
+        when it is called rather than when the results are first read.
+
+    Notes
+    --------
+    Items that are not well-formed, for example with a coordinate outside the grid, are reported
+    as invalid with the type of the error in the message, rather than stopping the stream. So are
+    items with n above MAX_DENSE_N, unless cls is one of the sparse classes of until.sparse.
+
+    At most 4 * workers chunks are submitted at a time. With ordered results, a new chunk is only
+    submitted once the oldest has been yielded, which bounds the results waiting to be yielded.
+    If the caller stops iterating early, queued chunks are cancelled and chunks already running
+    are left to finish in the background.
+    """
+    if chunksize < 1:
+        raise ValueError('chunksize must be at least 1.')
+    return _run_chunks(_validate_chunk, (cls,), _chunks(items, chunksize), workers, ordered)
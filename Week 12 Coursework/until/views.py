@@ -0,0 +1,268 @@
+"""
+Lazy transformed views of grids for the until package.
+
+Grid.rotated(), Grid.h_reflected() and Grid.v_reflected() each build a new grid. A GridView instead
+records a symmetry of the square, as one of the (swap, flip_row, flip_col) values of D4, against a
+shared base grid, and maps coordinates through it whenever a cell is read. Transforming a view only
+composes two symmetries, so chains of rotations and reflections allocate no grids at all, and a
+concrete grid is built by materialize() only when one is needed.
+
+Classes
+----------
+GridView
+    Read-only view of a grid under a symmetry of the square.
+"""
+
+from .grids import Grid, D4, _transform, _bitboard
+from .sparse import SparseGrid, _indices
+from .exceptions import OperatorError
+
+def _compose(outer, inner):
+    """
+    Return the D4 value of the symmetry that applies inner and then outer.
+
+    Each symmetry swaps the coordinates if asked and then flips them, so moving the swap of outer
+    in front of the flips of inner exchanges which of those flips acts on rows and which on
+    columns.
+    """
+    swap, flip_row, flip_col = inner
+    if outer[0]:
+        flip_row, flip_col = flip_col, flip_row
+    return outer[0] ^ swap, outer[1] ^ flip_row, outer[2] ^ flip_col
+
+def _inverse(n, coords, transform):
+    """
+    Return the cell of an n x n grid that a symmetry given as a value of D4 maps onto coords.
+    """
+    swap, flip_row, flip_col = transform
+    row, col = coords
+    if flip_row:
+        row = n - 1 - row
+    if flip_col:
+        col = n - 1 - col
+    if swap:
+        row, col = col, row
+    return row, col
+
+def _is_sparse(h):
+    """
+    Return whether h is a sparse grid or a view of one, whose bitboard would take n^2 / 8 bytes.
+    """
+    if isinstance(h, GridView):
+        h = h._base
+    return isinstance(h, SparseGrid)
+
+class GridView:
+    """
+    Represent a grid transformed by a symmetry of the square without copying it.
+
+    Parameters
+    -------------
+    base: Grid
+        Grid to view.
+
+    transform: str or tuple[bool, bool, bool]
+        Name of the symmetry, one of the keys of D4, or its (swap, flip_row, flip_col) value, by
+        default "identity".
+
+    For example, GridView(g, "rotated") reads like g.rotated(), and
+    GridView(g).rotated().h_reflected() composes the two symmetries without building a grid.
+
+    Attributes
+    -------------
+    base: Grid
+        The viewed grid.
+
+    transform: tuple[bool, bool, bool]
+        The (swap, flip_row, flip_col) value of the symmetry.
+
+    occupancies: list[tuple[int, int]]
+        The occupied coordinates of the view, in the order of the base grid.
+
+    Methods
+    ----------
+    get_row(i)
+        Return a copy of row i of the view.
+
+    v_reflected(), h_reflected(), rotated()
+        Return the view composed with another symmetry.
+
+    materialize()
+        Return the view as a concrete grid.
+
+    __contains__(coords)
+        Test whether a cell of the view is occupied.
+
+    __str__()
+        Return a human-readable drawing of the view.
+
+    __eq__(h), __le__(h), __ge__(h)
+        Compare the view with a grid or another view.
+
+    Notes
+    --------
+    A view shares its base grid, so later changes to the base are seen through the view. Views
+    have the _n and _bits of a grid, so grids and views can be combined and compared with each
+    other through the usual operators. Comparisons involving a sparse grid, or a view of one,
+    use sets of flat indices rather than bitboards, so they take O(k) memory.
+    """
+
+    def __init__(self, base, transform="identity"):
+        """
+        This method initialises instances of GridView.
+
+        Raises
+        ---------
+        KeyError
+            If transform is a string that is not a key of D4.
+        """
+        self._base = base
+        self._n = base._n
+        self._transform = D4[transform] if isinstance(transform, str) else tuple(transform)
+
+    @property
+    def base(self):
+        """
+        This method returns the viewed grid.
+        """
+        return self._base
+
+    @property
+    def transform(self):
+        """
+        This method returns the (swap, flip_row, flip_col) value of the symmetry.
+        """
+        return self._transform
+
+    @property
+    def _bits(self):
+        """
+        This method returns the bitboard of the view, computed from the base in O(k + n^2 / 8) time.
+        """
+        n = self._n
+        return _bitboard((row * n + col for row, col in self.occupancies), n)
+
+    @property
+    def occupancies(self):
+        """
+        This method returns the occupied coordinates of the view.
+        """
+        n = self._n
+        return [_transform(n, coords, self._transform) for coords in self._base.occupancies]
+
+    def __repr__(self):
+        """
+        This method returns a constructor-style representation of the view.
+        """
+        for name, value in D4.items():
+            if value == self._transform:
+                return f"GridView({self._base!r}, {name!r})"
+
+    def __contains__(self, coords):
+        """
+        This method tests whether the cell at coords is occupied in the view.
+
+        Raises
+        ---------
+        IndexError
+            If the coordinate lies outside the grid.
+        """
+        return self._base._has(_inverse(self._n, coords, self._transform))
+
+    def get_row(self, i):
+        """
+        This method returns a copy of row i of the view, reading each cell from the base grid.
+        """
+        n = self._n
+        i = range(n)[i]
+        has = self._base._has
+        return [has(_inverse(n, (i, j), self._transform)) for j in range(n)]
+
+    __str__ = Grid.__str__
+
+    def v_reflected(self):
+        """
+        This method returns the vertical reflection of the view, as a view of the same base.
+        """
+        return GridView(self._base, _compose(D4["v_reflected"], self._transform))
+
+    def h_reflected(self):
+        """
+        This method returns the horizontal reflection of the view, as a view of the same base.
+        """
+        return GridView(self._base, _compose(D4["h_reflected"], self._transform))
+
+    def rotated(self):
+        """
+        This method returns the clockwise rotation of the view, as a view of the same base.
+        """
+        return GridView(self._base, _compose(D4["rotated"], self._transform))
+
+    def materialize(self):
+        """
+        This method returns the view as a concrete grid.
+
+        Returns
+        ----------
+        Grid
+            New instance of the class of the base grid with the occupancies of the view.
+
+        Notes
+        --------
+        Every condition of the grid classes is invariant under the symmetries of the square, so
+        the new grid is not revalidated and takes the validity already known for the base.
+        """
+        base = self._base
+        grid = type(base)(self._n, self.occupancies, lazy=True)
+        grid._valid = base._valid
+        return grid
+
+    def __eq__(self, h):
+        """
+        This method checks whether the view has the same size and occupied cells as h.
+
+        Returns
+        ----------
+        bool
+            True if h is a grid or view of the same size with the same occupied cells, otherwise
+            False.
+        """
+        if not isinstance(h, (Grid, GridView)):
+            return NotImplemented
+        if self._n != h._n:
+            return False
+        if _is_sparse(self) or _is_sparse(h):
+            return _indices(self) == _indices(h)
+        return self._bits == h._bits
+
+    __hash__ = None
+
+    def __le__(self, h):
+        """
+        This method checks whether the occupancies of the view are a subset of h.
+
+        Raises
+        ---------
+        OperatorError
+            If the two sizes do not match.
+        """
+        if self._n != h._n:
+            raise OperatorError('Error: Grids must be of matching size.')
+        if _is_sparse(self) or _is_sparse(h):
+            return _indices(self) <= _indices(h)
+        return not self._bits & ~h._bits
+
+    def __ge__(self, h):
+        """
+        This method checks whether the occupancies of the view are a superset of h.
+
+        Raises
+        ---------
+        OperatorError
+            If the two sizes do not match.
+        """
+        if self._n != h._n:
+            raise OperatorError('Error: Grids must be of matching size.')
+        if _is_sparse(self) or _is_sparse(h):
+            return _indices(self) >= _indices(h)
+        return not h._bits & ~self._bits